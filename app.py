@@ -1,13 +1,16 @@
 import streamlit as st
 import pandas as pd
-import pickle
-import lzma
-from sklearn.preprocessing import LabelEncoder
 import traceback
-import os
-from datetime import datetime
-import numpy as np
+from datetime import datetime, date
 from PIL import Image
+import busca
+import dados
+import exportacao
+import classificacao
+import feedbacks
+import metricas
+import previsoes
+import vencimentos
 
 # Configuração da página
 st.set_page_config(
@@ -61,81 +64,44 @@ header_anvisa()
 
 # Função para verificar arquivos 
 def check_files():
-    required_files = [
-        'data/le_categoria.pkl', 
-        'data/le_empresa.pkl',
-        'data/le_produto.pkl',
-        'data/le_target.pkl',
-        'data/modelo_final.pkl.xz',
-        'data/produtos_classificados.csv'
-    ]
-    missing = [f for f in required_files if not os.path.exists(f)]
+    missing = dados.missing_files()
     if missing:
         st.error(f"Arquivos faltando: {', '.join(missing)}")
         return False
     return True
 
-# Função para carregar LabelEncoders
-def load_label_encoder(filepath):
-    try:
-        with open(filepath, 'rb') as f:
-            obj = pickle.load(f)
-            
-            # Caso 1: Já é um LabelEncoder
-            if isinstance(obj, LabelEncoder):
-                return obj
-                
-            # Caso 2: É um array numpy com as classes
-            encoder = LabelEncoder()
-            encoder.classes_ = obj
-            return encoder
-            
-    except Exception as e:
-        st.error(f"Erro ao carregar {filepath}: {str(e)}") 
-        traceback.print_exc()
-        return None
-
-# Carregar todos os dados
+# Carregar todos os dados (uma vez por processo) e acompanhar alterações nos arquivos
 @st.cache_resource
-def load_data():
+def load_repository():
     if not check_files():
         return None
         
     try:
-        # Carregar encoders
-        le_categoria = load_label_encoder('data/le_categoria.pkl')
-        le_empresa = load_label_encoder('data/le_empresa.pkl')
-        le_produto = load_label_encoder('data/le_produto.pkl')
-        le_target = load_label_encoder('data/le_target.pkl')
-        
-        # Verificar se todos os encoders foram carregados
-        if None in [le_categoria, le_empresa, le_produto, le_target]:
-            return None
-            
-        # Carregar modelo
-        with lzma.open('data/modelo_final.pkl.xz', 'rb') as f:
-            modelo = pickle.load(f)
-            
-        # Carregar dados
-        produtos_df = pd.read_csv('data/produtos_classificados.csv', sep=',')
-        
-        return {
-            'le_categoria': le_categoria,
-            'le_empresa': le_empresa,
-            'le_produto': le_produto,
-            'le_target': le_target,
-            'modelo': modelo,
-            'produtos_df': produtos_df
-        }
+        repositorio = dados.BundleRepository()
+        repositorio.start_watching()
+        return repositorio
         
     except Exception as e:
         st.error(f"Erro fatal ao carregar dados: {str(e)}")
         traceback.print_exc()
         return None
+
+# Snapshot dos dados usado do início ao fim desta execução do script
+def load_data():
+    repositorio = load_repository()
+    return repositorio.current() if repositorio is not None else None
     
 
 data = load_data()
 
+# Exportação periódica das métricas em arquivo (ANVISA_METRICAS_ARQUIVO), iniciada uma única vez por processo
+metricas.start_file_export()
+
+# Armazenamento dos relatórios de erro, compartilhado entre as sessões
+@st.cache_resource
+def get_feedback_store():
+    return feedbacks.FeedbackStore()
+
 # Função para adicionar logo e estilo
 def add_logo():
     st.markdown(
@@ -204,46 +170,232 @@ def add_logo():
         unsafe_allow_html=True
     )
 
+# Estatísticas da base, recalculadas só quando os dados mudam ou o dia vira
+@st.cache_data(max_entries=4)
+def compute_stats(_data, versao, dia):
+    return classificacao.compute_stats(_data)
+
+# Painel de métricas por etapa na barra lateral (apenas com ANVISA_METRICAS=1)
+def metrics_panel():
+    if not metricas.enabled():
+        return
+
+    with st.sidebar.expander("⏱️ Métricas de desempenho"):
+        cache = previsoes.cache.stats()
+        st.caption(
+            f"Cache de previsões: {cache['acertos']} acertos, {cache['falhas']} falhas "
+            f"({format_percent(cache['taxa_acerto'] * 100)}), {cache['itens']}/{cache['capacidade']} itens"
+        )
+
+        etapas = metricas.registro.snapshot()
+        if not etapas:
+            st.caption("Nenhuma medição registrada ainda.")
+            return
+
+        st.dataframe(
+            pd.DataFrame([
+                {
+                    'Etapa': etapa,
+                    'Chamadas': valores['contagem'],
+                    'Média (ms)': valores['media_s'] * 1000,
+                    'Máximo (ms)': valores['maximo_s'] * 1000,
+                    'Total (s)': valores['soma_s']
+                }
+                for etapa, valores in etapas.items()
+            ]).style.format({'Média (ms)': '{:.2f}', 'Máximo (ms)': '{:.2f}', 'Total (s)': '{:.3f}'}),
+            hide_index=True,
+            use_container_width=True
+        )
+        st.download_button(
+            "Baixar métricas (Prometheus)",
+            data=metricas.registro.to_prometheus(),
+            file_name="anvisa_metricas.prom",
+            mime="text/plain"
+        )
+
+# Quantidade máxima de opções enviadas para as listas de produto e empresa
+LIMITE_OPCOES = 50
+
+# Quantidade máxima de empresas exibidas na carteira e critérios de ordenação (colunas, crescente)
+LIMITE_CARTEIRA = 200
+ORDENS_CARTEIRA = {
+    'Mais registros vencidos': (['VENCIDO', 'PERTO DO VENCIMENTO'], False),
+    'Mais registros perto do vencimento': (['PERTO DO VENCIMENTO', 'VENCIDO'], False),
+    'Vencimento mais próximo': (['DIAS_PARA_VENCER', 'TOTAL'], [True, False]),
+    'Mais registros no total': (['TOTAL'], False)
+}
+
+# Registros incluídos na exportação: (filtrar pela categoria, filtrar pela empresa)
+ESCOPOS_EXPORTACAO = {
+    'Toda a categoria selecionada': (True, False),
+    'Todos os registros da empresa selecionada': (False, True),
+    'Categoria e empresa selecionadas': (True, True)
+}
+
+# Modos da consulta de produtos
+MODO_REGISTRO = 'Número de registro'
+MODOS_CONSULTA = ['Categoria, produto e empresa', MODO_REGISTRO]
+
+# Função para formatar percentuais no padrão brasileiro
+def format_percent(valor):
+    return f"{valor:.1f}".replace('.', ',') + "%"
+
 # Função para fazer previsões
 def predict_product(categoria, produto, empresa):
     try:
-        # Buscar informações do produto no dataframe
-        product_info = data['produtos_df'][
-            (data['produtos_df']['DS_CATEGORIA_PRODUTO'] == categoria) & 
-            (data['produtos_df']['NO_PRODUTO'] == produto) & 
-            (data['produtos_df']['NO_RAZAO_SOCIAL_EMPRESA'] == empresa)
-        ].iloc[0]
-
-        # Aplicar a lógica de classificação manualmente
-        situacao = product_info['ST_SITUACAO_REGISTRO']
-        vencimento = pd.to_datetime(product_info['DT_VENCIMENTO_REGISTRO'])
-        dias_para_vencer = (vencimento - pd.to_datetime('today')).days
-
-        if situacao == 'INATIVO':
-            classificacao = 'INATIVO'
-        elif situacao == 'ATIVO':
-            if dias_para_vencer < 0:
-                classificacao = 'VENCIDO'
-            elif 0 <= dias_para_vencer <= 180:
-                classificacao = 'PERTO DO VENCIMENTO'
-            else:
-                classificacao = 'ATIVO'
-        else:
-            classificacao = 'INDEFINIDO'
-
-        return {
-            'classificacao': classificacao, 
-            'validade': product_info['DT_VENCIMENTO_REGISTRO'],
-            'empresa': product_info['NO_RAZAO_SOCIAL_EMPRESA'],
-            'registro': product_info['NU_REGISTRO_PRODUTO']
-        }
+        resultado = classificacao.lookup_product(data, categoria, produto, empresa)
+        if resultado is None:
+            st.error("Nenhum registro encontrado para esta combinação de categoria, produto e empresa.")
+        return resultado
+    except Exception as e:
+        st.error(f"Erro ao fazer previsão: {str(e)}")
+        return None
+
+# Função para consultar pelo número de registro
+def predict_registration(numero):
+    try:
+        resultado = classificacao.lookup_registration(data, numero)
+        if resultado is None:
+            st.error(f"Nenhum registro encontrado com o número {numero}.")
+        return resultado
     except Exception as e:
         st.error(f"Erro ao fazer previsão: {str(e)}")
         return None
 
+# Consulta direta por número de registro (digitado, colado ou lido por leitor de código de barras)
+# Cada número é uma consulta ao índice de registros montado no carregamento, sem percorrer a base
+def registration_search():
+    texto = st.text_area(
+        "Números de registro",
+        placeholder="Um ou mais números, separados por espaço, vírgula ou quebra de linha",
+        key='consulta_registros'
+    )
+    if not st.button("Consultar Registro", key='consulta_registro_botao'):
+        return
+
+    numeros = classificacao.parse_registrations(texto)
+    if not numeros:
+        st.warning("Informe ao menos um número de registro.")
+        return
+
+    if len(numeros) == 1:
+        resultado = predict_registration(numeros[0])
+        if resultado:
+            show_result(resultado)
+        return
+
+    resultado_registros = classificacao.lookup_registrations(data, numeros)
+    contagem = resultado_registros['CLASSIFICACAO'].value_counts()
+    st.markdown(" • ".join(f"**{classe}**: {total}" for classe, total in contagem.items()))
+    st.dataframe(resultado_registros, hide_index=True, use_container_width=True)
+    st.download_button(
+        "Baixar resultado (CSV)",
+        data=resultado_registros.to_csv(index=False).encode('utf-8'),
+        file_name="classificacao_registros.csv",
+        mime="text/csv",
+        key='consulta_registros_baixar'
+    )
+
+# Função para exibir o resultado de uma consulta (cards, alertas e formulário de reporte de erro)
+def show_result(resultado):
+    # Mensagens condicionais baseadas na classificação
+    if resultado['classificacao'] == "PERTO DO VENCIMENTO":
+        st.warning("⚠️ **Atenção:** Produto perto do vencimento. Ação recomendada em 180 dias conforme RDC 157/2002.")
+    elif resultado['classificacao'] == "ATIVO":
+        st.success("✅ Classificação confirmada conforme legislação ANVISA.")
+    elif resultado['classificacao'] == "VENCIDO":
+        st.error("❌ **Produto vencido:** Retirada imediata do mercado exigida pela legislação.")
+    elif resultado['classificacao'] == "INATIVO":
+        st.info("ℹ️ **Registro inativo:** Verificar motivo da inativação no sistema ANVISA.")
+    if resultado['outros_registros']:
+        outros = ', '.join(str(r) for r in resultado['outros_registros'])
+        st.warning(
+            f"⚠️ Esta combinação corresponde a {len(resultado['outros_registros']) + 1} registros. "
+            f"Exibindo o registro {resultado['registro']}; demais registros: {outros}."
+        )
+    st.session_state['mostrar_formulario'] = True  # Ativa flag na sessão
+
+    # Exibir resultados em cards
+    st.markdown("### Resultado da Consulta")
+
+    col_res1, col_res2 = st.columns(2)
+
+    with col_res1:
+        st.markdown(
+            f"""
+            <div style='background-color: #006341; padding: 15px; border-radius: 10px; margin-bottom: 10px;'>
+                <h4 style='color: #e1f0e8; margin-top: 0;'>Classificação</h4>
+                <p style='font-size: 18px;'>{resultado['classificacao']}</p>
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
+
+        st.markdown(
+            f"""
+            <div style='background-color: #006341; padding: 15px; border-radius: 10px; margin-bottom: 10px;'>
+                <h4 style='color: #e1f0e8; margin-top: 0;'>Empresa Responsável</h4>
+                <p style='font-size: 18px;'>{resultado['empresa']}</p>
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
+
+    with col_res2:
+        st.markdown(
+            f"""
+            <div style='background-color:  #006341; padding: 15px; border-radius: 10px; margin-bottom: 10px;'>
+                <h4 style='color: #e1f0e8; margin-top: 0;'>Data de Validade</h4>
+                <p style='font-size: 18px;'>{resultado['validade']}</p>
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
+
+        st.markdown(
+            f"""
+            <div style='background-color: #006341; padding: 15px; border-radius: 10px; margin-bottom: 10px;'>
+                <h4 style='color: #e1f0e8; margin-top: 0;'>Número de Registro</h4>
+                <p style='font-size: 18px;'>{resultado['registro']}</p>
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
+
+    # Formulário INDEPENDENTE para report de erro
+    if st.session_state.get('mostrar_formulario', False):
+        with st.form(key='feedback_form'):
+            st.subheader("✏️ Reportar Erro")
+            erro = st.text_area("Use está seção apenas em caso de identificação de erro na classificação. Descreva detalhadamente o problema encontrado:")
+
+            if st.form_submit_button("Enviar Relatório"):
+                if erro.strip():
+                    # Salvar feedback
+                    get_feedback_store().add(
+                        resultado['produto'],
+                        resultado['empresa'],
+                        erro,
+                        data=datetime.now().strftime("%Y-%m-%d %H:%M")
+                    )
+                    st.success("✅ Relatório enviado à equipe ANVISA!")
+                    st.session_state['mostrar_formulario'] = False  # Fecha formulário
+                else:
+                    st.warning("Por favor, descreva o erro encontrado.")
+        st.markdown("""
+        <style>
+            div[data-testid="stForm"] {
+                border: 1px solid #006341;
+                border-radius: 10px;
+                padding: 20px;
+            }
+        </style>
+        """, unsafe_allow_html=True)
+
+
 # Página principal
 def main():
     add_logo()
+    metrics_panel()
     
     if data is None:
         st.error("""
@@ -255,39 +407,47 @@ def main():
         3. O arquivo CSV está no formato correto
         
         Arquivos necessários:
-        - le_categoria.pkl, le_empresa.pkl, le_produto.pkl, le_target.pkl
-        - modelo_final.pkl.xz
-        - produtos_classificados.csv
+        - le_categoria.pkl, le_empresa.pkl, le_produto.pkl, le_target.pkl (ou os vocabulários em data/vocabularios, gerados por `python vocabulario.py`)
+        - modelo_final.pkl.xz (ou modelo_final.joblib, gerado por `python modelo.py`, ou a floresta compilada de `python modelo.py --formato floresta`)
+        - produtos_classificados.csv (ou produtos_classificados.feather, gerado por `python dados.py`)
         """)
         return
     
-    tab1, tab2 = st.tabs(["Conheça o Projeto", "Consulta de Produtos"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(
+        ["Conheça o Projeto", "Consulta de Produtos", "Consulta em Lote", "Vencimentos", "Empresas"]
+    )
     
     with tab1:
         st.header("📊 Sobre a Base")
     
             # Container com estatísticas
-        st.markdown("""
+        stats = compute_stats(data, data['versao'], date.today())
+        percentuais = {classe: format_percent(stats['percentuais'].get(classe, 0)) for classe in classificacao.CLASSES}
+        st.markdown(f"""
             <div style="display: grid; grid-template-columns: repeat(4, 1fr); gap: 15px; margin-bottom: 30px;">
                 <div style="background: #006341; border-radius: 10px; padding: 15px; text-align: center; box-shadow: 0 4px 6px rgba(0,0,0,0.05);">
                     <h3 style="color: #e1f0e8; margin: 0;">✅ Ativos</h3>
-                    <p style="font-size: 24px; font-weight: bold; margin: 5px 0;">36%</p>
+                    <p style="font-size: 24px; font-weight: bold; margin: 5px 0;">{percentuais['ATIVO']}</p>
                 </div>
                 <div style="background: #d4a017; border-radius: 10px; padding: 15px; text-align: center; box-shadow: 0 4px 6px rgba(0,0,0,0.05);">
                     <h3 style="color: #fff8e6; margin: 0;">⏳ Perto do Venc.</h3>
-                    <p style="font-size: 24px; font-weight: bold; margin: 5px 0;">2%</p>
+                    <p style="font-size: 24px; font-weight: bold; margin: 5px 0;">{percentuais['PERTO DO VENCIMENTO']}</p>
                 </div>
                 <div style="background: #d32f2f; border-radius: 10px; padding: 15px; text-align: center; box-shadow: 0 4px 6px rgba(0,0,0,0.05);">
                     <h3 style="color: #ffebee; margin: 0;">❌ Vencidos</h3>
-                    <p style="font-size: 24px; font-weight: bold; margin: 5px 0;">9,5%</p>
+                    <p style="font-size: 24px; font-weight: bold; margin: 5px 0;">{percentuais['VENCIDO']}</p>
                 </div>
                 <div style="background: #616161; border-radius: 10px; padding: 15px; text-align: center; box-shadow: 0 4px 6px rgba(0,0,0,0.05);">
                     <h3 style="color: #f5f5f5; margin: 0;">🔒 Inativos</h3>
-                    <p style="font-size: 24px; font-weight: bold; margin: 5px 0;">52,5%</p>
+                    <p style="font-size: 24px; font-weight: bold; margin: 5px 0;">{percentuais['INATIVO']}</p>
                 </div>
             </div>
             """, unsafe_allow_html=True)
 
+        with st.expander("📂 **Distribuição por Categoria**"):
+            st.caption(f"{stats['total']} registros classificados em {date.today().strftime('%d/%m/%Y')}")
+            st.dataframe(stats['por_categoria'], use_container_width=True)
+
             # Seção "Objetivo do Projeto" 
         with st.expander("🎯 **Objetivo do Projeto**", expanded=True):
                 st.markdown("""
@@ -319,15 +479,34 @@ def main():
 
             # Seção do Modelo
         with st.expander("📈 **Sobre o Modelo**"):
+                # Métricas do modelo sobre a base atual (calculadas em segundo plano); até lá, as do treinamento
+                avaliacao_atual = data['avaliacao'].get()
+                acuracia = f"{avaliacao_atual['acuracia']:.2%}" if avaliacao_atual else "97.43%"
+                origem = "na base atual" if avaliacao_atual else "no treinamento"
+
                 col1, col2, col3 = st.columns(3)
                 with col2:
-                    st.markdown("""
+                    st.markdown(f"""
                     <div style='background-color: #006341; padding: 20px; border-radius: 10px; text-align: center; box-shadow: 0 4px 8px rgba(0,0,0,0.1)'>
                         <h3 style='color: white; margin: 0;'>Acurácia do Modelo</h3>
-                        <p style='font-size: 32px; font-weight: bold; color: white; margin: 10px 0;'>97.43%</p>
-                        <p style='color: #e1f0e8; margin: 0;'>Taxa de classificação correta</p>
+                        <p style='font-size: 32px; font-weight: bold; color: white; margin: 10px 0;'>{acuracia}</p>
+                        <p style='color: #e1f0e8; margin: 0;'>Taxa de classificação correta {origem}</p>
                     </div>
                     """, unsafe_allow_html=True)
+
+                if avaliacao_atual:
+                    st.caption(
+                        f"Previsões do modelo para {avaliacao_atual['linhas_avaliadas']} registros da base atual, "
+                        f"comparadas com a classificação por regra de "
+                        f"{date.fromisoformat(avaliacao_atual['dia']).strftime('%d/%m/%Y')}."
+                    )
+                elif data['avaliacao'].erro:
+                    st.warning(
+                        f"Não foi possível avaliar o modelo sobre a base atual ({data['avaliacao'].erro}). "
+                        "Exibindo as métricas do treinamento."
+                    )
+                else:
+                    st.info("Avaliando o modelo sobre a base atual em segundo plano; por enquanto são exibidas as métricas do treinamento.")
                 
                 st.markdown("---")
                 
@@ -358,13 +537,16 @@ def main():
                 # Tabela de Métricas
                 st.subheader("📈 Métricas Detalhadas por Classe")
                 
-                metrics_df = pd.DataFrame({
-                    'Classe': ['ATIVO', 'INATIVO', 'PERTO DO VENCIMENTO', 'VENCIDO'],
-                    'Precisão': [0.99, 1.00, 0.68, 0.90],
-                    'Recall': [0.97, 0.98, 0.97, 0.98],
-                    'F1-Score': [0.98, 0.99, 0.80, 0.94],
-                    'Exemplos': [10569, 15367, 559, 2796]
-                })
+                if avaliacao_atual:
+                    metrics_df = pd.DataFrame(avaliacao_atual['por_classe'])
+                else:
+                    metrics_df = pd.DataFrame({
+                        'Classe': ['ATIVO', 'INATIVO', 'PERTO DO VENCIMENTO', 'VENCIDO'],
+                        'Precisão': [0.99, 1.00, 0.68, 0.90],
+                        'Recall': [0.97, 0.98, 0.97, 0.98],
+                        'F1-Score': [0.98, 0.99, 0.80, 0.94],
+                        'Exemplos': [10569, 15367, 559, 2796]
+                    })
                 
                 # Formatação condicional para destacar valores baixos
                 def color_low(val):
@@ -382,6 +564,17 @@ def main():
                     hide_index=True,
                     use_container_width=True
                 )
+
+                if avaliacao_atual:
+                    st.subheader("🧮 Matriz de Confusão (base atual)")
+                    st.dataframe(
+                        pd.DataFrame(
+                            avaliacao_atual['matriz_confusao'],
+                            index=[f"Regra: {r}" for r in avaliacao_atual['rotulos']],
+                            columns=[f"Modelo: {r}" for r in avaliacao_atual['rotulos']]
+                        ),
+                        use_container_width=True
+                    )
                 
                 # Explicação complementar
         with st.expander("ℹ️ Como interpretar estas métricas?"):
@@ -415,139 +608,115 @@ def main():
                     st.error("Dados não carregados corretamente. Verifique os arquivos necessários.")
                     return
                 
-                # Seleção da categoria
-                categoria = st.selectbox(
-                    "Selecione a Categoria do Produto",
-                    options=data['le_categoria'].classes_,
-                    index=0
-                )
+                modo = st.radio("Consultar por", options=MODOS_CONSULTA, horizontal=True, key='consulta_modo')
+                if modo == MODO_REGISTRO:
+                    registration_search()
+                else:
+                    # Seleção da categoria
+                    categoria = st.selectbox(
+                        "Selecione a Categoria do Produto",
+                        options=data['le_categoria'].classes_,
+                        index=0
+                    )
 
-                # Filtrar produtos baseado na categoria selecionada
-                produtos_filtrados = data['produtos_df'][
-                    data['produtos_df']['DS_CATEGORIA_PRODUTO'] == categoria
-                ]['NO_PRODUTO'].unique()
+                    # Filtrar produtos baseado na categoria selecionada (apenas os mais parecidos com a busca)
+                    indice_categoria = data['indice'].get(categoria, {})
+                    busca_produto = st.text_input(
+                        "Buscar Produto",
+                        placeholder="Digite parte do nome do produto"
+                    )
+                    with metricas.timer('filtro_produtos'):
+                        produtos_filtrados = busca.search_options(
+                            indice_categoria,
+                            data['busca_produtos'].get(categoria),
+                            busca_produto,
+                            LIMITE_OPCOES
+                        )
+                    if len(indice_categoria) > LIMITE_OPCOES:
+                        st.caption(
+                            f"{len(indice_categoria)} produtos nesta categoria; "
+                            f"a lista mostra até {LIMITE_OPCOES}. Digite parte do nome para refinar."
+                        )
 
-                # Seleção do produto
-                produto = st.selectbox(
-                    "Selecione o Produto",
-                    options=produtos_filtrados,
-                    index=0
-                )
+                    # Seleção do produto
+                    produto = st.selectbox(
+                        "Selecione o Produto",
+                        options=produtos_filtrados,
+                        index=0
+                    )
 
-                # Filtrar empresas baseado no produto selecionado
-                empresas_filtradas = data['produtos_df'][
-                    (data['produtos_df']['DS_CATEGORIA_PRODUTO'] == categoria) &
-                    (data['produtos_df']['NO_PRODUTO'] == produto)
-                ]['NO_RAZAO_SOCIAL_EMPRESA'].unique()
-
-                # Seleção da empresa
-                empresa = st.selectbox(
-                    "Selecione a Empresa",
-                    options=empresas_filtradas,
-                    index=0
-                )
+                    # Filtrar empresas baseado no produto selecionado
+                    empresas_produto = indice_categoria.get(produto, {})
+                    busca_empresa = ''
+                    if len(empresas_produto) > LIMITE_OPCOES:
+                        busca_empresa = st.text_input(
+                            "Buscar Empresa",
+                            placeholder="Digite parte da razão social"
+                        )
+                    with metricas.timer('filtro_empresas'):
+                        if len(empresas_produto) > LIMITE_OPCOES:
+                            empresas_filtradas = busca.search_options(
+                                empresas_produto,
+                                data['busca_empresas'],
+                                busca_empresa,
+                                LIMITE_OPCOES,
+                                permitidos=empresas_produto
+                            )
+                        else:
+                            empresas_filtradas = list(empresas_produto)
 
-                if st.button("Consultar Produto"):
-                    with st.spinner("Processando consulta..."):
-                        resultado = predict_product(categoria, produto, empresa)  
+                    # Seleção da empresa
+                    empresa = st.selectbox(
+                        "Selecione a Empresa",
+                        options=empresas_filtradas,
+                        index=0
+                    )
+
+                    if st.button("Consultar Produto"):
+                        with st.spinner("Processando consulta..."):
+                            resultado = predict_product(categoria, produto, empresa)  
                 
-                        if len(empresas_filtradas) == 0:
-                            st.warning("Nenhuma empresa encontrada para este produto/categoria.")
-                            return
+                            if len(empresas_filtradas) == 0:
+                                st.warning("Nenhuma empresa encontrada para este produto/categoria.")
+                                return
                                         
-                        if resultado:
-                            # Mensagens condicionais baseadas na classificação
-                            if resultado['classificacao'] == "PERTO DO VENCIMENTO":
-                                st.warning("⚠️ **Atenção:** Produto perto do vencimento. Ação recomendada em 180 dias conforme RDC 157/2002.")
-                            elif resultado['classificacao'] == "ATIVO":
-                                st.success("✅ Classificação confirmada conforme legislação ANVISA.")
-                            elif resultado['classificacao'] == "VENCIDO":
-                                st.error("❌ **Produto vencido:** Retirada imediata do mercado exigida pela legislação.")
-                            elif resultado['classificacao'] == "INATIVO":
-                                st.info("ℹ️ **Registro inativo:** Verificar motivo da inativação no sistema ANVISA.")
-                            st.session_state['mostrar_formulario'] = True  # Ativa flag na sessão
-
-                            # Exibir resultados em cards
-                            st.markdown("### Resultado da Consulta")
-                                    
-                            col_res1, col_res2 = st.columns(2)
-                            
-                            with col_res1:
-                                st.markdown(
-                                    f"""
-                                    <div style='background-color: #006341; padding: 15px; border-radius: 10px; margin-bottom: 10px;'>
-                                        <h4 style='color: #e1f0e8; margin-top: 0;'>Classificação</h4>
-                                        <p style='font-size: 18px;'>{resultado['classificacao']}</p>
-                                    </div>
-                                    """,
-                                    unsafe_allow_html=True
-                                )
-                                
-                                st.markdown(
-                                    f"""
-                                    <div style='background-color: #006341; padding: 15px; border-radius: 10px; margin-bottom: 10px;'>
-                                        <h4 style='color: #e1f0e8; margin-top: 0;'>Empresa Responsável</h4>
-                                        <p style='font-size: 18px;'>{resultado['empresa']}</p>
-                                    </div>
-                                    """,
-                                    unsafe_allow_html=True
-                                )
-                            
-                            with col_res2:
-                                st.markdown(
-                                    f"""
-                                    <div style='background-color:  #006341; padding: 15px; border-radius: 10px; margin-bottom: 10px;'>
-                                        <h4 style='color: #e1f0e8; margin-top: 0;'>Data de Validade</h4>
-                                        <p style='font-size: 18px;'>{resultado['validade']}</p>
-                                    </div>
-                                    """,
-                                    unsafe_allow_html=True
-                                )
-                                
-                                st.markdown(
-                                    f"""
-                                    <div style='background-color: #006341; padding: 15px; border-radius: 10px; margin-bottom: 10px;'>
-                                        <h4 style='color: #e1f0e8; margin-top: 0;'>Número de Registro</h4>
-                                        <p style='font-size: 18px;'>{resultado['registro']}</p>
-                                    </div>
-                                    """,
-                                    unsafe_allow_html=True
+                            if resultado:
+                                show_result(resultado)
+
+                    # Exportação dos registros da categoria e/ou empresa selecionadas, com a classificação do dia
+                    with st.expander("📥 Exportar registros"):
+                        escopo = st.radio("Registros", options=list(ESCOPOS_EXPORTACAO), key='exportar_escopo')
+                        formato_exportacao = st.radio(
+                            "Formato", options=list(exportacao.FORMATOS), horizontal=True, key='exportar_formato'
+                        )
+
+                        # As linhas só são selecionadas ao gerar o arquivo: as demais interações da página não
+                        # percorrem a base
+                        if st.button("Gerar arquivo", key='exportar_gerar'):
+                            por_categoria, por_empresa = ESCOPOS_EXPORTACAO[escopo]
+                            linhas_exportacao = exportacao.select_rows(
+                                data['produtos_df'],
+                                categoria=categoria if por_categoria else None,
+                                empresa=empresa if por_empresa else None
+                            )
+                            if len(linhas_exportacao) == 0:
+                                st.info("Nenhum registro para exportar.")
+                            else:
+                                # O botão de download do Streamlit precisa do arquivo inteiro; o gerador evita montar
+                                # a tabela completa. Para exportações muito grandes use GET /exportar do servico.py
+                                with st.spinner("Gerando arquivo..."):
+                                    conteudo = b''.join(
+                                        exportacao.iter_export(data, linhas_exportacao, formato_exportacao)
+                                    )
+                                tipo, extensao = exportacao.FORMATOS[formato_exportacao]
+                                st.caption(f"{len(linhas_exportacao)} registros exportados.")
+                                st.download_button(
+                                    "Baixar arquivo",
+                                    data=conteudo,
+                                    file_name=f"produtos_{date.today().isoformat()}.{extensao}",
+                                    mime=tipo,
+                                    key='exportar_baixar'
                                 )
-                                
-                                # Formulário INDEPENDENTE para report de erro
-                            if st.session_state.get('mostrar_formulario', False):
-                                with st.form(key='feedback_form'):
-                                    st.subheader("✏️ Reportar Erro")
-                                    erro = st.text_area("Use está seção apenas em caso de identificação de erro na classificação. Descreva detalhadamente o problema encontrado:")
-                                    
-                                    if st.form_submit_button("Enviar Relatório"):
-                                        if erro.strip():
-                                            # Salvar feedback
-                                            feedback = {
-                                                'data': datetime.now().strftime("%Y-%m-%d %H:%M"),
-                                                'produto': produto,
-                                                'empresa': empresa,
-                                                'erro': erro
-                                            }
-                                            pd.DataFrame([feedback]).to_csv(
-                                                "feedbacks.csv",
-                                                mode='a',
-                                                header=not os.path.exists("feedbacks.csv"),
-                                                index=False
-                                            )
-                                            st.success("✅ Relatório enviado à equipe ANVISA!")
-                                            st.session_state['mostrar_formulario'] = False  # Fecha formulário
-                                        else:
-                                            st.warning("Por favor, descreva o erro encontrado.")
-                                st.markdown("""
-                                <style>
-                                    div[data-testid="stForm"] {
-                                        border: 1px solid #006341;
-                                        border-radius: 10px;
-                                        padding: 20px;
-                                    }
-                                </style>
-                                """, unsafe_allow_html=True)
             except Exception as e:
                 st.error(f"Erro ao carregar opções de consulta: {str(e)}")
                 traceback.print_exc()
@@ -563,7 +732,7 @@ def main():
             - 🔒 INATIVO - Registros cancelados ou suspensos
                         
             Como funciona:
-            - Selecione categoria, produto e empresa
+            - Selecione categoria, produto e empresa, ou informe um ou mais números de registro
             - Obtenha a classificação regulatória instantânea
             - Acesse informações completas sobre validade e status
             
@@ -575,7 +744,140 @@ def main():
             - Email: ti@anvisa.gov.br
             - Telefone: (61) 3462-5400
             """)
-            
+
+    with tab3:
+        st.header("📋 Consulta em Lote")
+        st.markdown("""
+        Envie um arquivo CSV com a coluna **NU_REGISTRO_PRODUTO** ou com as colunas
+        **DS_CATEGORIA_PRODUTO**, **NO_PRODUTO** e **NO_RAZAO_SOCIAL_EMPRESA** para classificar
+        todos os produtos de uma só vez.
+        """)
+
+        arquivo = st.file_uploader("Arquivo de consulta", type=['csv'])
+        if arquivo is not None:
+            try:
+                consulta_df = pd.read_csv(arquivo, sep=None, engine='python', dtype=str)
+                resultado_lote = classificacao.classify_batch(data, consulta_df)
+
+                contagem = resultado_lote['CLASSIFICACAO'].value_counts()
+                st.markdown(" • ".join(f"**{classe}**: {total}" for classe, total in contagem.items()))
+
+                st.dataframe(resultado_lote, hide_index=True, use_container_width=True)
+                st.download_button(
+                    "Baixar resultado (CSV)",
+                    data=resultado_lote.to_csv(index=False).encode('utf-8'),
+                    file_name="classificacao_lote.csv",
+                    mime="text/csv"
+                )
+            except ValueError as e:
+                st.warning(str(e))
+            except Exception as e:
+                st.error(f"Erro ao processar o arquivo: {str(e)}")
+                traceback.print_exc()
+
+    with tab4:
+        st.header("📅 Vencimentos por Prazo")
+        st.markdown("Registros que vencem nos próximos dias, por categoria e empresa, em ordem de vencimento.")
+
+        col_prazo, col_categoria = st.columns(2)
+        with col_prazo:
+            opcoes_prazo = {f"{dias} dias": dias for dias in vencimentos.PRAZOS}
+            prazo = opcoes_prazo[st.selectbox(
+                "Vencem em até",
+                options=list(opcoes_prazo),
+                index=len(opcoes_prazo) - 1
+            )]
+        with col_categoria:
+            categoria_prazo = st.selectbox(
+                "Categoria",
+                options=['Todas'] + list(data['le_categoria'].classes_),
+                key='vencimentos_categoria'
+            )
+
+        busca_empresa_prazo = st.text_input(
+            "Buscar Empresa",
+            placeholder="Digite parte da razão social (opcional)",
+            key='vencimentos_busca_empresa'
+        )
+        empresas_prazo = ['Todas']
+        if busca_empresa_prazo.strip():
+            empresas_prazo += data['busca_empresas'].search(busca_empresa_prazo, k=LIMITE_OPCOES)
+        empresa_prazo = st.selectbox("Empresa", options=empresas_prazo, key='vencimentos_empresa')
+
+        try:
+            filtros = {
+                'categoria': None if categoria_prazo == 'Todas' else categoria_prazo,
+                'empresa': None if empresa_prazo == 'Todas' else empresa_prazo
+            }
+            total, _ = data['vencimentos'].expiring(prazo, tamanho=0, **filtros)
+            paginas = max(1, -(-total // vencimentos.TAMANHO_PAGINA))
+            pagina = st.number_input(f"Página (de {paginas})", min_value=1, max_value=paginas, value=1, step=1)
+
+            _, linhas = data['vencimentos'].expiring(prazo, pagina=pagina - 1, **filtros)
+            st.caption(f"{total} registros vencem nos próximos {prazo} dias.")
+            if total:
+                pagina_df = classificacao.classified_rows(data, linhas)
+                st.dataframe(
+                    pagina_df.rename(columns={
+                        'NU_REGISTRO_PRODUTO': 'Registro',
+                        'DS_CATEGORIA_PRODUTO': 'Categoria',
+                        'NO_PRODUTO': 'Produto',
+                        'NO_RAZAO_SOCIAL_EMPRESA': 'Empresa',
+                        'ST_SITUACAO_REGISTRO': 'Situação',
+                        'DT_VENCIMENTO_REGISTRO': 'Vencimento',
+                        'DIAS_PARA_VENCER': 'Dias para vencer',
+                        'CLASSIFICACAO': 'Classificação'
+                    }),
+                    hide_index=True,
+                    use_container_width=True,
+                    column_config={
+                        'Registro': st.column_config.NumberColumn(format="%d"),
+                        'Vencimento': st.column_config.DateColumn(format="DD/MM/YYYY")
+                    }
+                )
+        except Exception as e:
+            st.error(f"Erro ao consultar vencimentos: {str(e)}")
+            traceback.print_exc()
+
+    with tab5:
+        st.header("🏭 Carteira por Empresa")
+        st.markdown("Registros de cada empresa por classificação e o próximo vencimento entre os registros vigentes.")
+
+        try:
+            carteira = data['carteiras'].get()
+
+            col_ordem, col_busca = st.columns(2)
+            with col_ordem:
+                ordem = st.selectbox("Ordenar por", options=list(ORDENS_CARTEIRA), key='carteira_ordem')
+            with col_busca:
+                busca_carteira = st.text_input(
+                    "Buscar Empresa",
+                    placeholder="Digite parte da razão social (opcional)",
+                    key='carteira_busca_empresa'
+                )
+
+            if busca_carteira.strip():
+                # Restringe às empresas encontradas pela busca (a ordenação escolhida continua valendo)
+                encontradas = data['busca_empresas'].search(busca_carteira, k=LIMITE_OPCOES)
+                carteira = carteira.loc[carteira.index.intersection(encontradas)]
+
+            colunas_ordem, crescente = ORDENS_CARTEIRA[ordem]
+            with metricas.timer('ordenar_carteira'):
+                exibidas = carteira.sort_values(colunas_ordem, ascending=crescente, na_position='last').head(LIMITE_CARTEIRA)
+
+            st.caption(f"{len(carteira)} empresas; exibindo as primeiras {len(exibidas)}.")
+            st.dataframe(
+                exibidas.rename(columns={
+                    'DIAS_PARA_VENCER': 'Dias para o próximo vencimento',
+                    'PROXIMO_VENCIMENTO': 'Próximo vencimento'
+                }),
+                use_container_width=True,
+                column_config={'Próximo vencimento': st.column_config.DateColumn(format="DD/MM/YYYY")}
+            )
+        except Exception as e:
+            st.error(f"Erro ao montar a carteira das empresas: {str(e)}")
+            traceback.print_exc()
+
 # RODAPE
 st.markdown("""
 <style>
@@ -607,3 +909,7 @@ st.markdown("""
 
 if __name__ == "__main__":
     main()
+
+    # Carregar o modelo em segundo plano depois que a interface foi exibida
+    if data is not None:
+        data['modelo'].preload()
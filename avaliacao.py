@@ -0,0 +1,245 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import classificacao
+import floresta
+import metricas
+import modelo
+
+# Avaliação do modelo sobre a base atual: previsões do Random Forest comparadas com a classificação por regra
+# As previsões são feitas em blocos, distribuídos entre processos; o resultado fica em cache (memória e disco)
+# até os dados, os encoders, o modelo ou o dia mudarem
+
+CACHE_DIR = 'data/avaliacao'
+
+# Linhas enviadas a cada processo por vez
+CHUNK_SIZE = 50000
+
+_modelo_processo = None
+
+
+# Função para definir quantos processos usar (deixa um núcleo livre para a aplicação)
+def default_processes():
+    return max(1, (os.cpu_count() or 1) - 1)
+
+
+# Função para montar a matriz de atributos (categoria, produto, empresa) e o alvo segundo a regra do dia
+# Retorna (X, y, linhas_validas); linhas com valores fora do vocabulário dos encoders ficam de fora
+def build_dataset(produtos_df, encoders, codigos_regra):
+    colunas = [
+        encoders['le_categoria'].encode(produtos_df['DS_CATEGORIA_PRODUTO'].array),
+        encoders['le_produto'].encode(produtos_df['NO_PRODUTO'].array),
+        encoders['le_empresa'].encode(produtos_df['NO_RAZAO_SOCIAL_EMPRESA'].array)
+    ]
+
+    # Códigos da regra (posição em ROTULOS) convertidos para os códigos do le_target
+    alvo = encoders['le_target'].encode(
+        pd.Categorical.from_codes(codigos_regra, categories=list(classificacao.ROTULOS))
+    )
+
+    validas = (alvo >= 0) & np.logical_and.reduce([coluna >= 0 for coluna in colunas])
+    X = np.column_stack([coluna[validas] for coluna in colunas]).astype(np.int32)
+    return X, alvo[validas], np.flatnonzero(validas)
+
+
+def _init_worker():
+    global _modelo_processo
+    _modelo_processo = modelo.load_model()
+
+
+def _score_chunk(X):
+    return _modelo_processo.predict(X)
+
+
+# Função para prever todas as linhas, em blocos, usando um pool de processos
+def predict_all(X, processos=None, tamanho_bloco=CHUNK_SIZE, carregar_modelo=None):
+    processos = processos or default_processes()
+    blocos = [X[i:i + tamanho_bloco] for i in range(0, len(X), tamanho_bloco)]
+    if not blocos:
+        return np.array([], dtype=np.int64)
+
+    # Com um único bloco (ou processo) não compensa iniciar o pool
+    if processos <= 1 or len(blocos) == 1:
+        modelo_local = carregar_modelo() if carregar_modelo else modelo.load_model()
+        return np.concatenate([modelo_local.predict(bloco) for bloco in blocos])
+
+    # spawn: os processos não herdam as threads do servidor (Streamlit/HTTP)
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=min(processos, len(blocos)), mp_context=contexto, initializer=_init_worker) as pool:
+        return np.concatenate(list(pool.map(_score_chunk, blocos)))
+
+
+# Função para calcular matriz de confusão e métricas por classe
+def compute_metrics(y_true, y_pred, rotulos):
+    k = len(rotulos)
+    matriz = np.bincount(y_true * k + y_pred, minlength=k * k).reshape(k, k)
+
+    acertos = np.diag(matriz)
+    previstos = matriz.sum(axis=0)
+    reais = matriz.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precisao = np.where(previstos > 0, acertos / previstos, 0.0)
+        recall = np.where(reais > 0, acertos / reais, 0.0)
+        f1 = np.where(precisao + recall > 0, 2 * precisao * recall / (precisao + recall), 0.0)
+
+    return {
+        'acuracia': float(acertos.sum() / matriz.sum()) if matriz.sum() else 0.0,
+        'rotulos': [str(r) for r in rotulos],
+        'matriz_confusao': matriz.tolist(),
+        'por_classe': [
+            {
+                'Classe': str(rotulo),
+                'Precisão': float(precisao[i]),
+                'Recall': float(recall[i]),
+                'F1-Score': float(f1[i]),
+                'Exemplos': int(reais[i])
+            }
+            for i, rotulo in enumerate(rotulos)
+        ]
+    }
+
+
+# Função para avaliar o modelo sobre toda a base, com a classificação por regra do dia como referência
+def evaluate(produtos_df, encoders, diario, processos=None, carregar_modelo=None, tamanho_bloco=CHUNK_SIZE):
+    inicio = time.perf_counter()
+    with metricas.timer('avaliacao_modelo'):
+        dia, _, codigos = diario.get()
+        X, y, linhas = build_dataset(produtos_df, encoders, codigos)
+        previsoes = predict_all(X, processos, tamanho_bloco, carregar_modelo)
+        resultado = compute_metrics(y, previsoes, encoders['le_target'].classes_)
+
+    resultado.update({
+        'dia': dia.isoformat(),
+        'linhas_avaliadas': int(len(linhas)),
+        'linhas_ignoradas': int(len(produtos_df) - len(linhas)),
+        'duracao_s': time.perf_counter() - inicio
+    })
+    return resultado
+
+
+# Função para identificar a combinação avaliada (dados, encoders, modelo de origem, floresta compilada e dia)
+# assinatura_encoders: (caminho, data de modificação, tamanho) dos arquivos dos encoders carregados
+def evaluation_key(versao, dia, assinatura_encoders=()):
+    caminho, _ = modelo.find_model_file()
+    compilado = floresta.metadata_path()
+    assinatura = (
+        versao,
+        assinatura_encoders,
+        caminho,
+        os.path.getmtime(caminho) if caminho else None,
+        os.path.getmtime(compilado) if os.path.exists(compilado) else None,
+        dia.isoformat()
+    )
+    return hashlib.sha1(repr(assinatura).encode('utf-8')).hexdigest()[:16]
+
+
+# Avaliação do modelo executada em segundo plano; a página só lê o último resultado pronto
+class ModelEvaluation:
+    def __init__(self, produtos_df, encoders, diario, versao, carregar_modelo=None, processos=None, cache_dir=CACHE_DIR,
+                 assinatura_encoders=()):
+        self._produtos_df = produtos_df
+        self._encoders = encoders
+        self._diario = diario
+        self._versao = versao
+        self._assinatura_encoders = assinatura_encoders
+        self._carregar_modelo = carregar_modelo
+        self._processos = processos
+        self._cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self._thread = None
+        self._chave = None
+        self._resultado = None
+        self.erro = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    # Retorna o resultado do dia (ou None enquanto a avaliação roda); inicia a avaliação se necessário
+    def get(self):
+        chave = evaluation_key(self._versao, date.today(), self._assinatura_encoders)
+        with self._lock:
+            if self._chave == chave:
+                return self._resultado
+            if self._thread is None:
+                resultado = self._read_cache(chave)
+                if resultado is not None:
+                    self._chave, self._resultado = chave, resultado
+                    return resultado
+                self.erro = None
+                self._thread = threading.Thread(target=self._run, args=(chave,), name='avaliacao-modelo', daemon=True)
+                self._thread.start()
+        return None
+
+    def _run(self, chave):
+        try:
+            resultado = evaluate(
+                self._produtos_df, self._encoders, self._diario, self._processos, self._carregar_modelo
+            )
+            self._write_cache(chave, resultado)
+            with self._lock:
+                self._chave, self._resultado = chave, resultado
+        except Exception as e:
+            # Não repete a avaliação a cada acesso: só tenta de novo quando dados, encoders, modelo ou dia mudarem
+            traceback.print_exc()
+            with self._lock:
+                self._chave, self._resultado = chave, None
+                self.erro = str(e)
+        finally:
+            with self._lock:
+                self._thread = None
+
+    def _cache_path(self, chave):
+        return os.path.join(self._cache_dir, f"{chave}.json")
+
+    def _read_cache(self, chave):
+        try:
+            with open(self._cache_path(chave), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    # Grava o resultado para outros processos (e reinícios) não repetirem a avaliação no mesmo dia
+    def _write_cache(self, chave, resultado):
+        try:
+            os.makedirs(self._cache_dir, exist_ok=True)
+            tmp_path = self._cache_path(chave) + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(resultado, f, ensure_ascii=False)
+            os.replace(tmp_path, self._cache_path(chave))
+
+            # Resultados de outros dias ou versões não serão mais lidos
+            for nome in os.listdir(self._cache_dir):
+                if nome.endswith('.json') and nome != f"{chave}.json":
+                    os.remove(os.path.join(self._cache_dir, nome))
+        except OSError:
+            traceback.print_exc()
+
+
+if __name__ == "__main__":
+    import dados
+
+    parser = argparse.ArgumentParser(description="Avalia o modelo sobre a base atual, comparando com a classificação por regra")
+    parser.add_argument('--processos', type=int, default=default_processes())
+    parser.add_argument('--bloco', type=int, default=CHUNK_SIZE, help="linhas por bloco enviado a cada processo")
+    args = parser.parse_args()
+
+    data = dados.load_bundle()
+    resultado = evaluate(data['produtos_df'], data, data['diario'], args.processos, tamanho_bloco=args.bloco)
+
+    print(f"Acurácia: {resultado['acuracia']:.2%} ({resultado['linhas_avaliadas']} registros, "
+          f"{resultado['linhas_ignoradas']} fora do vocabulário) em {resultado['duracao_s']:.1f}s")
+    for classe in resultado['por_classe']:
+        print(f"  {classe['Classe']:<22} precisão {classe['Precisão']:.2%}  recall {classe['Recall']:.2%}  "
+              f"F1 {classe['F1-Score']:.2%}  exemplos {classe['Exemplos']}")
@@ -0,0 +1,203 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Mede carga, filtros e buscas das listas de seleção, consulta individual, seleção da exportação e
+# classificação em lote (por registro e por categoria/produto/empresa) sobre bases sintéticas
+#   python benchmarks/bench.py --escalas 10,100
+# Cada escala roda em um processo separado, para que a carga seja "a frio" e o pico de memória seja isolado
+
+RESULTADOS_PATH = os.path.join(RAIZ, 'benchmarks', 'resultados')
+CONSULTAS = 2000
+TAMANHO_LOTE = 10000
+LIMITE_OPCOES = 50
+
+
+# Função para resumir uma lista de latências (em microssegundos)
+def summarize(latencias):
+    latencias = np.asarray(latencias) * 1e6
+    return {
+        'p50_us': float(np.percentile(latencias, 50)),
+        'p99_us': float(np.percentile(latencias, 99)),
+        'media_us': float(latencias.mean())
+    }
+
+
+# Função para montar as opções das listas de produto e empresa como na página de consulta (app.py)
+def options_for(data, categoria, produto, busca_produto, busca_empresa):
+    import busca
+
+    indice_categoria = data['indice'].get(categoria, {})
+    busca.search_options(indice_categoria, data['busca_produtos'].get(categoria), busca_produto, LIMITE_OPCOES)
+    empresas_produto = indice_categoria.get(produto, {})
+    if len(empresas_produto) > LIMITE_OPCOES:
+        return busca.search_options(
+            empresas_produto, data['busca_empresas'], busca_empresa, LIMITE_OPCOES, permitidos=empresas_produto
+        )
+    return list(empresas_produto)
+
+
+# Função para medir a classificação de um lote (tempo total e linhas por segundo)
+def measure_batch(data, lote):
+    import classificacao
+
+    inicio = time.perf_counter()
+    classificacao.classify_batch(data, lote)
+    duracao = time.perf_counter() - inicio
+    return {'linhas': len(lote), 'duracao_s': duracao, 'linhas_por_s': len(lote) / duracao}
+
+
+# Função para medir uma escala (executada no processo filho, dentro da pasta da base sintética)
+def measure(formato):
+    import classificacao
+    import dados
+    import exportacao
+
+    resultado = {}
+    if formato == 'feather':
+        inicio = time.perf_counter()
+        dados.build_feather()
+        resultado['conversao_feather_s'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    data = dados.load_bundle()
+    data['diario'].get()
+    resultado['carga_s'] = time.perf_counter() - inicio
+    resultado['linhas'] = len(data['produtos_df'])
+
+    rng = np.random.default_rng(0)
+    chaves = list(data['lookup'])
+    amostra = [chaves[i] for i in rng.integers(0, len(chaves), CONSULTAS)]
+
+    # Opções das listas em cascata de uma execução do script, sem texto digitado (categoria → produtos → empresas)
+    latencias = []
+    for categoria, produto, _ in amostra:
+        inicio = time.perf_counter()
+        options_for(data, categoria, produto, '', '')
+        latencias.append(time.perf_counter() - inicio)
+    resultado['filtro'] = summarize(latencias)
+
+    # Opções com parte do nome digitada; inclui a montagem de cada índice de busca na primeira consulta
+    latencias = []
+    for categoria, produto, empresa in amostra[:200]:
+        inicio = time.perf_counter()
+        options_for(data, categoria, produto, produto[:12], empresa[:8])
+        latencias.append(time.perf_counter() - inicio)
+    resultado['busca'] = summarize(latencias)
+
+    # Consulta individual
+    latencias = []
+    for chave in amostra:
+        inicio = time.perf_counter()
+        classificacao.lookup_product(data, *chave)
+        latencias.append(time.perf_counter() - inicio)
+    resultado['consulta'] = summarize(latencias)
+
+    # Seleção das linhas da exportação (categoria, empresa e as duas juntas)
+    latencias = []
+    for categoria, _, empresa in amostra[:200]:
+        inicio = time.perf_counter()
+        exportacao.select_rows(data['produtos_df'], categoria=categoria)
+        exportacao.select_rows(data['produtos_df'], empresa=empresa)
+        exportacao.select_rows(data['produtos_df'], categoria=categoria, empresa=empresa)
+        latencias.append(time.perf_counter() - inicio)
+    resultado['selecao_exportacao'] = summarize(latencias)
+
+    # Classificação em lote por número de registro e por categoria/produto/empresa
+    registros = data['produtos_df']['NU_REGISTRO_PRODUTO'].to_numpy()
+    lote = pd.DataFrame({
+        'NU_REGISTRO_PRODUTO': registros[rng.integers(0, len(registros), TAMANHO_LOTE)].astype(str)
+    })
+    resultado['lote'] = measure_batch(data, lote)
+
+    triplas = [chaves[i] for i in rng.integers(0, len(chaves), TAMANHO_LOTE)]
+    lote = pd.DataFrame(triplas, columns=classificacao.CHAVE_TRIPLA)
+    resultado['lote_tripla'] = measure_batch(data, lote)
+
+    resultado['pico_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return resultado
+
+
+# Função para gerar a base de uma escala e medi-la em um processo separado
+def run_scale(escala, formato):
+    from gerar_base import generate
+
+    with tempfile.TemporaryDirectory(prefix=f'anvisa_bench_x{escala}_') as pasta:
+        generate(escala, pasta)
+        processo = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--medir', formato],
+            cwd=pasta, capture_output=True, text=True, check=True
+        )
+    resultado = json.loads(processo.stdout.strip().splitlines()[-1])
+    resultado['escala'] = escala
+    resultado['formato'] = formato
+    return resultado
+
+
+# Função para identificar o commit medido
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=RAIZ, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks da carga e das consultas em bases sintéticas")
+    parser.add_argument('--escalas', default='10,100', help="fatores de escala separados por vírgula (ex.: 10,100,1000)")
+    parser.add_argument('--formatos', default='csv,feather', help="formatos de carga a medir")
+    parser.add_argument('--saida', help="arquivo JSON de resultados")
+    parser.add_argument('--medir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        import warnings
+        warnings.filterwarnings('ignore')
+        print(json.dumps(measure(args.medir)))
+        sys.exit(0)
+
+    execucoes = []
+    for escala in [float(e) for e in args.escalas.split(',')]:
+        for formato in args.formatos.split(','):
+            resultado = run_scale(escala, formato)
+            execucoes.append(resultado)
+            print(
+                f"x{escala:g} {formato}: {resultado['linhas']} linhas, carga {resultado['carga_s']:.2f}s, "
+                f"consulta p50 {resultado['consulta']['p50_us']:.1f}us, "
+                f"lote {resultado['lote']['linhas_por_s']:.0f} linhas/s "
+                f"(tripla {resultado['lote_tripla']['linhas_por_s']:.0f}), pico {resultado['pico_rss_mb']:.0f} MB",
+                file=sys.stderr
+            )
+
+    relatorio = {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'execucoes': execucoes
+    }
+    saida = args.saida or os.path.join(
+        RESULTADOS_PATH, f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, 'w', encoding='utf-8') as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
+    print(f"Resultados gravados em {saida}", file=sys.stderr)
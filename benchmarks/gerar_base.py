@@ -0,0 +1,90 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import vocabulario
+
+# Gera uma base sintética no mesmo formato de data/produtos_classificados.csv
+#   python benchmarks/gerar_base.py --escala 10 --destino /tmp/base_x10
+
+# Tamanho e cardinalidades da amostra distribuída com a aplicação (escala 1)
+LINHAS_BASE = 29291
+EMPRESAS_BASE = 1602
+PRODUTOS_POR_LINHA = 0.975
+CATEGORIAS = ['Outros', 'Produtos de Cabelo', 'Produtos para o Corpo', 'Produtos para o Rosto']
+
+PALAVRAS = [
+    'SHAMPOO', 'CONDICIONADOR', 'CREME', 'LOCAO', 'HIDRATANTE', 'SABONETE', 'LIQUIDO', 'GEL',
+    'PROTETOR', 'SOLAR', 'FPS', 'DESODORANTE', 'AEROSOL', 'OLEO', 'MASCARA', 'CAPILAR', 'FACIAL',
+    'CORPORAL', 'INFANTIL', 'BABY', 'ANTICASPA', 'NUTRITIVO', 'REPARADOR', 'ÓLEO', 'LOÇÃO', 'MÃOS'
+]
+SUFIXOS_EMPRESA = ['LTDA', 'LTDA - ME', 'LTDA - EPP', 'S.A.', 'EIRELI']
+
+
+# Função para gerar nomes distintos combinando palavras e um número de série
+def make_names(rng, quantidade, prefixo, palavras_por_nome):
+    escolhas = rng.integers(0, len(PALAVRAS), size=(quantidade, palavras_por_nome))
+    return [
+        f"{prefixo} {' '.join(PALAVRAS[j] for j in linha)} {i}"
+        for i, linha in enumerate(escolhas)
+    ]
+
+
+# Função para gerar a base sintética (CSV e encoders) em destino/data
+def generate(escala, destino, semente=0):
+    rng = np.random.default_rng(semente)
+    linhas = int(LINHAS_BASE * escala)
+    n_produtos = max(1, int(linhas * PRODUTOS_POR_LINHA))
+    # Empresas crescem mais devagar que a base: o número de registrantes não escala linearmente
+    n_empresas = max(1, int(EMPRESAS_BASE * np.sqrt(escala)))
+
+    produtos = np.array(make_names(rng, n_produtos, 'PRODUTO', 3), dtype=object)
+    empresas = np.array(
+        [f"EMPRESA {nome} {SUFIXOS_EMPRESA[i % len(SUFIXOS_EMPRESA)]}"
+         for i, nome in enumerate(make_names(rng, n_empresas, 'COSMETICOS', 2))],
+        dtype=object
+    )
+
+    # Poucas empresas concentram muitos registros (distribuição de Zipf)
+    indice_empresa = (rng.zipf(1.3, size=linhas) - 1) % n_empresas
+    hoje = pd.Timestamp.today().normalize()
+    produtos_df = pd.DataFrame({
+        'NU_REGISTRO_PRODUTO': 100000000 + rng.permutation(linhas).astype(np.int64) * 7,
+        'DS_CATEGORIA_PRODUTO': np.array(CATEGORIAS, dtype=object)[rng.integers(0, len(CATEGORIAS), linhas)],
+        'NO_PRODUTO': produtos[rng.integers(0, n_produtos, linhas)],
+        'NO_RAZAO_SOCIAL_EMPRESA': empresas[indice_empresa],
+        'ST_SITUACAO_REGISTRO': np.where(rng.random(linhas) < 0.525, 'INATIVO', 'ATIVO'),
+        'DT_VENCIMENTO_REGISTRO': (hoje + pd.to_timedelta(rng.integers(-3650, 3650, linhas), unit='D')).strftime('%Y-%m-%d')
+    })
+
+    pasta = os.path.join(destino, 'data')
+    os.makedirs(pasta, exist_ok=True)
+    produtos_df.to_csv(os.path.join(pasta, 'produtos_classificados.csv'), index=False)
+
+    # Vocabulários gravados direto no formato em arrays (lidos sem pickle por dados.load_vocabulary)
+    classes = {
+        'le_categoria': np.array(sorted(CATEGORIAS), dtype=object),
+        'le_empresa': np.array(sorted(set(produtos_df['NO_RAZAO_SOCIAL_EMPRESA'])), dtype=object),
+        'le_produto': np.array(sorted(set(produtos_df['NO_PRODUTO'])), dtype=object),
+        'le_target': np.array(['ATIVO', 'INATIVO', 'PERTO DO VENCIMENTO', 'VENCIDO'], dtype=object)
+    }
+    for nome, valores in classes.items():
+        vocabulario.Vocabulary.from_values(valores).save(nome, os.path.join(pasta, 'vocabularios'))
+
+    return linhas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera uma base sintética de produtos para benchmarks")
+    parser.add_argument('--escala', type=float, default=1)
+    parser.add_argument('--destino', required=True)
+    parser.add_argument('--semente', type=int, default=0)
+    args = parser.parse_args()
+
+    linhas = generate(args.escala, args.destino, args.semente)
+    print(f"{linhas} registros gravados em {os.path.join(args.destino, 'data')}")
@@ -0,0 +1,141 @@
+import re
+import threading
+import unicodedata
+from itertools import islice
+
+import numpy as np
+
+import metricas
+
+# Quantidade de candidatos (por trigramas em comum) reordenados pelo critério final
+CANDIDATOS_POR_RESULTADO = 5
+
+
+# Função para normalizar textos: sem acentos, minúsculo e só letras/números separados por espaço
+def normalize(texto):
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(re.sub(r'[^0-9a-z]+', ' ', texto.casefold()).split())
+
+
+# Função para extrair os trigramas de um texto normalizado (cada palavra com bordas, como no pg_trgm)
+def trigrams(texto):
+    gramas = set()
+    for palavra in texto.split():
+        palavra = f"  {palavra} "
+        gramas.update(palavra[i:i + 3] for i in range(len(palavra) - 2))
+    return gramas
+
+
+# Função para montar as listas de posições de cada trigrama (a partir da posição inicial dos textos)
+def posting_lists(normalizados, inicio=0):
+    listas = {}
+    for i, texto in enumerate(normalizados, inicio):
+        for grama in trigrams(texto):
+            listas.setdefault(grama, []).append(i)
+    return {grama: np.array(ids, dtype=np.int32) for grama, ids in listas.items()}
+
+
+# Índice de busca aproximada por trigramas sobre uma lista de nomes
+# Os textos normalizados e as listas de trigramas são montados na primeira busca não vazia: categorias que
+# ninguém consulta não pesam na carga
+class SearchIndex:
+    def __init__(self, nomes):
+        self.nomes = sorted(set(nomes))
+        self.posicoes = {nome: i for i, nome in enumerate(self.nomes)}
+        self._removidos = np.array([], dtype=np.int32)
+        self._lock = threading.Lock()
+        self._estado = None
+
+    def __len__(self):
+        return len(self.nomes) - len(self._removidos)
+
+    # Retorna (textos normalizados, listas de trigramas), montando-os na primeira chamada
+    def _get(self):
+        estado = self._estado
+        if estado is None:
+            with self._lock:
+                if self._estado is None:
+                    with metricas.timer('indice_busca'):
+                        normalizados = [normalize(nome) for nome in self.nomes]
+                        self._estado = (normalizados, posting_lists(normalizados))
+                estado = self._estado
+        return estado
+
+    # Retorna uma cópia com nomes acrescentados e/ou removidos; se o índice já foi montado, só as listas dos
+    # trigramas dos nomes novos são refeitas, e os removidos apenas deixam de aparecer nos resultados
+    def updated(self, adicionar=(), remover=()):
+        novo = SearchIndex(())
+        novo.nomes = list(self.nomes)
+        novo.posicoes = dict(self.posicoes)
+        removidos = set(self._removidos.tolist())
+
+        inicio = len(novo.nomes)
+        for nome in adicionar:
+            i = novo.posicoes.get(nome)
+            if i is not None:
+                removidos.discard(i)
+                continue
+            novo.posicoes[nome] = len(novo.nomes)
+            novo.nomes.append(nome)
+
+        estado = self._estado
+        if estado is not None:
+            normalizados = estado[0] + [normalize(nome) for nome in novo.nomes[inicio:]]
+            listas = dict(estado[1])
+            for grama, ids in posting_lists(normalizados[inicio:], inicio).items():
+                anteriores = listas.get(grama)
+                listas[grama] = ids if anteriores is None else np.concatenate([anteriores, ids])
+            novo._estado = (normalizados, listas)
+
+        removidos.update(novo.posicoes[nome] for nome in remover if nome in novo.posicoes)
+        novo._removidos = np.array(sorted(removidos), dtype=np.int32)
+        return novo
+
+    # Retorna até k nomes mais parecidos com o texto digitado (opcionalmente só entre os permitidos)
+    def search(self, texto, k=50, permitidos=None):
+        with metricas.timer('busca'):
+            return self._search(texto, k, permitidos)
+
+    def _search(self, texto, k, permitidos):
+        consulta = normalize(texto)
+        if not consulta:
+            return []
+
+        normalizados, listas_trigramas = self._get()
+        listas = [listas_trigramas[g] for g in trigrams(consulta) if g in listas_trigramas]
+        if not listas:
+            return []
+
+        # Quantidade de trigramas em comum com a consulta, para cada nome
+        pontos = np.bincount(np.concatenate(listas), minlength=len(self.nomes))
+        pontos[self._removidos] = 0
+        if permitidos is not None:
+            mascara = np.zeros(len(self.nomes), dtype=bool)
+            mascara[[self.posicoes[n] for n in permitidos if n in self.posicoes]] = True
+            pontos[~mascara] = 0
+
+        candidatos = np.flatnonzero(pontos)
+        limite = k * CANDIDATOS_POR_RESULTADO
+        if len(candidatos) > limite:
+            candidatos = candidatos[np.argpartition(-pontos[candidatos], limite)[:limite]]
+
+        # Ordem final: começa com o texto, contém o texto, mais trigramas em comum, nome mais curto
+        def ordem(i):
+            normalizado = normalizados[i]
+            return (
+                not normalizado.startswith(consulta),
+                consulta not in normalizado,
+                -pontos[i],
+                len(normalizado),
+                self.nomes[i]
+            )
+
+        return [self.nomes[i] for i in sorted(candidatos, key=ordem)[:k]]
+
+
+# Função para escolher as opções de uma lista de seleção: resultados da busca ou, sem texto, os primeiros nomes
+def search_options(nomes, indice_busca, texto, limite, permitidos=None):
+    if texto.strip() and indice_busca is not None:
+        return indice_busca.search(texto, k=limite, permitidos=permitidos)
+    return list(islice(nomes, limite))
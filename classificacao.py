@@ -0,0 +1,381 @@
+import re
+import threading
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import metricas
+import previsoes
+
+# Ordem de exibição das classificações
+CLASSES = ['ATIVO', 'PERTO DO VENCIMENTO', 'VENCIDO', 'INATIVO']
+
+# Rótulos indexados pelos códigos de classificação (o último cobre situações desconhecidas)
+ROTULOS = np.array(CLASSES + ['INDEFINIDO'], dtype=object)
+CODIGO_INDEFINIDO = len(CLASSES)
+
+# Dias para vencer usados quando a data de vencimento está ausente (nunca vence)
+SEM_VENCIMENTO = np.iinfo(np.int32).max
+
+# Limites da regra em dias corridos até o vencimento (VENCIDO até o primeiro, PERTO DO VENCIMENTO até o segundo)
+# Reproduzem a regra original, que contava os dias completos entre o instante atual e a data de vencimento (um a
+# menos que os dias corridos): registro que vence hoje já está VENCIDO e o que vence em 181 dias está PERTO
+LIMITE_VENCIDO = 0
+LIMITE_PERTO_VENCIMENTO = 181
+
+# Colunas usadas para identificar produtos na consulta em lote
+CHAVE_TRIPLA = ['DS_CATEGORIA_PRODUTO', 'NO_PRODUTO', 'NO_RAZAO_SOCIAL_EMPRESA']
+CHAVE_REGISTRO = ['NU_REGISTRO_PRODUTO']
+
+# Maior quantidade de dígitos de um número de registro que cabe em int64
+MAX_DIGITOS_REGISTRO = 18
+
+
+# Função para calcular, em dias corridos, quanto falta para cada vencimento
+def days_to_expiry(vencimentos, hoje=None):
+    hoje = pd.Timestamp(hoje if hoje is not None else date.today())
+    vencimentos = pd.to_datetime(pd.Series(vencimentos), errors='coerce').dt.normalize()
+    dias = (vencimentos - hoje).dt.days
+    return dias.fillna(SEM_VENCIMENTO).to_numpy(dtype=np.int32)
+
+
+# Função para aplicar a regra de classificação a colunas inteiras; retorna códigos (índices de ROTULOS)
+def classify_codes(situacoes, dias_para_vencer):
+    situacoes = np.asarray(situacoes, dtype=object)
+
+    ativo = situacoes == 'ATIVO'
+    return np.select(
+        [
+            situacoes == 'INATIVO',
+            ativo & (dias_para_vencer <= LIMITE_VENCIDO),
+            ativo & (dias_para_vencer <= LIMITE_PERTO_VENCIMENTO),
+            ativo
+        ],
+        [CLASSES.index('INATIVO'), CLASSES.index('VENCIDO'), CLASSES.index('PERTO DO VENCIMENTO'), CLASSES.index('ATIVO')],
+        default=CODIGO_INDEFINIDO
+    ).astype(np.int8)
+
+
+# Função para classificar vários produtos de uma vez (mesma regra da consulta individual)
+def classify_products(situacoes, vencimentos, hoje=None):
+    return ROTULOS[classify_codes(situacoes, days_to_expiry(vencimentos, hoje))]
+
+
+# Função para copiar um array para um tamanho maior (as posições novas recebem o valor informado)
+def _extend(valores, tamanho, preencher):
+    novo = np.full(tamanho, preencher, dtype=valores.dtype)
+    novo[:len(valores)] = valores
+    return novo
+
+
+# Dias para vencer e classificação de toda a base, calculados uma vez por dia e compartilhados entre as sessões
+class DailyClassification:
+    def __init__(self, produtos_df):
+        self._produtos_df = produtos_df
+        self._lock = threading.Lock()
+        self._estado = None
+
+    # Retorna (dia, dias_para_vencer, codigos); recalcula na primeira consulta depois da meia-noite
+    def get(self):
+        hoje = date.today()
+        estado = self._estado
+        if estado is None or estado[0] != hoje:
+            with self._lock:
+                if self._estado is None or self._estado[0] != hoje:
+                    self._estado = self._compute(hoje)
+                estado = self._estado
+        return estado
+
+    def _compute(self, hoje):
+        with metricas.timer('classificacao_diaria'):
+            dias_para_vencer = days_to_expiry(self._produtos_df['DT_VENCIMENTO_REGISTRO'], hoje)
+            codigos = classify_codes(self._produtos_df['ST_SITUACAO_REGISTRO'], dias_para_vencer)
+        return hoje, dias_para_vencer, codigos
+
+    # Retorna uma cópia para a nova versão da base: se o dia já foi calculado, só as linhas informadas são
+    # reclassificadas (as demais são copiadas); senão o cálculo continua sob demanda
+    def patched(self, produtos_df, linhas):
+        novo = DailyClassification(produtos_df)
+        estado = self._estado
+        if estado is not None:
+            dia, dias_para_vencer, codigos = estado
+            dias_para_vencer = _extend(dias_para_vencer, len(produtos_df), SEM_VENCIMENTO)
+            codigos = _extend(codigos, len(produtos_df), CODIGO_INDEFINIDO)
+            dias_para_vencer[linhas] = days_to_expiry(produtos_df['DT_VENCIMENTO_REGISTRO'].array[linhas], dia)
+            codigos[linhas] = classify_codes(produtos_df['ST_SITUACAO_REGISTRO'].array[linhas], dias_para_vencer[linhas])
+            novo._estado = (dia, dias_para_vencer, codigos)
+        return novo
+
+    @property
+    def dias_para_vencer(self):
+        return self.get()[1]
+
+    @property
+    def codigos(self):
+        return self.get()[2]
+
+    # Classificação de toda a base como Categorical (sem copiar os textos)
+    def categorical(self):
+        return pd.Categorical.from_codes(self.codigos, categories=list(ROTULOS))
+
+
+# Códigos das classificações que ainda valem (ativos que não venceram)
+VIGENTES = [CLASSES.index('ATIVO'), CLASSES.index('PERTO DO VENCIMENTO')]
+
+
+# Função para contar os registros de cada empresa por classificação e achar o próximo vencimento vigente
+# Um único agrupamento vetorizado pelos códigos da coluna de empresa (sem laço por empresa)
+def portfolio_arrays(codigos_empresa, quantidade, dias_para_vencer, codigos):
+    validos = codigos_empresa >= 0
+    contagens = np.bincount(
+        codigos_empresa[validos].astype(np.int64) * len(ROTULOS) + codigos[validos],
+        minlength=quantidade * len(ROTULOS)
+    ).reshape(quantidade, len(ROTULOS))
+
+    vigentes = validos & np.isin(codigos, VIGENTES)
+    proximo = np.full(quantidade, SEM_VENCIMENTO, dtype=np.int64)
+    np.minimum.at(proximo, codigos_empresa[vigentes], dias_para_vencer[vigentes])
+    return contagens, proximo
+
+
+# Função para montar a tabela da carteira (uma linha por empresa com registros)
+def portfolio_frame(empresas, contagens, proximo, hoje):
+    carteira = pd.DataFrame(contagens, columns=list(ROTULOS), index=pd.Index(empresas, name='Empresa'))
+    if not carteira['INDEFINIDO'].any():
+        carteira = carteira.drop(columns='INDEFINIDO')
+    carteira['TOTAL'] = contagens.sum(axis=1)
+
+    sem_vencimento = proximo == SEM_VENCIMENTO
+    carteira['DIAS_PARA_VENCER'] = pd.arrays.IntegerArray(proximo, sem_vencimento)
+    carteira['PROXIMO_VENCIMENTO'] = pd.Timestamp(hoje) + pd.to_timedelta(carteira['DIAS_PARA_VENCER'].astype('float64'), unit='D')
+    return carteira[carteira['TOTAL'] > 0]
+
+
+# Função para resumir a carteira de cada empresa: registros por classificação e próximo vencimento
+def company_portfolio(produtos_df, dias_para_vencer, codigos, hoje=None):
+    empresas = produtos_df['NO_RAZAO_SOCIAL_EMPRESA'].array
+    contagens, proximo = portfolio_arrays(empresas.codes, len(empresas.categories), dias_para_vencer, codigos)
+    return portfolio_frame(empresas.categories, contagens, proximo, hoje if hoje is not None else date.today())
+
+
+# Carteira de todas as empresas, recalculada junto com a classificação diária
+class CompanyPortfolio:
+    def __init__(self, produtos_df, diario):
+        self._produtos_df = produtos_df
+        self._diario = diario
+        self._lock = threading.Lock()
+        self._estado = None
+
+    # Retorna o DataFrame da carteira (uma linha por empresa) do dia atual
+    def get(self):
+        dia, dias_para_vencer, codigos = self._diario.get()
+        estado = self._estado
+        if estado is None or estado[0] != dia:
+            with self._lock:
+                if self._estado is None or self._estado[0] != dia:
+                    with metricas.timer('carteira_empresas'):
+                        empresas = self._produtos_df['NO_RAZAO_SOCIAL_EMPRESA'].array
+                        contagens, proximo = portfolio_arrays(
+                            empresas.codes, len(empresas.categories), dias_para_vencer, codigos
+                        )
+                        self._estado = (dia, contagens, proximo, portfolio_frame(empresas.categories, contagens, proximo, dia))
+                estado = self._estado
+        return estado[3]
+
+    # Retorna uma cópia para a nova versão da base: as contagens das linhas alteradas são retiradas e
+    # somadas de novo, e o próximo vencimento é refeito só para as empresas dessas linhas
+    # vencimentos: ExpiryIndex da nova versão (linhas de cada empresa já ordenadas por data)
+    def patched(self, produtos_df, diario, anterior_diario, linhas, vencimentos):
+        novo = CompanyPortfolio(produtos_df, diario)
+        estado = self._estado
+        estado_diario = diario._estado
+        if estado is None or estado_diario is None or estado[0] != estado_diario[0] or anterior_diario._estado is None:
+            return novo
+
+        dia, contagens, proximo, _ = estado
+        _, dias_para_vencer, codigos = estado_diario
+        codigos_anteriores = anterior_diario._estado[2]
+        empresas = produtos_df['NO_RAZAO_SOCIAL_EMPRESA'].array
+        empresas_anteriores = self._produtos_df['NO_RAZAO_SOCIAL_EMPRESA'].array.codes
+        quantidade = len(empresas.categories)
+
+        # As categorias de empresa só crescem (novas no final): os códigos antigos continuam valendo
+        contagens = np.vstack([contagens, np.zeros((quantidade - len(contagens), len(ROTULOS)), dtype=contagens.dtype)])
+        proximo = np.concatenate([proximo, np.full(quantidade - len(proximo), SEM_VENCIMENTO, dtype=proximo.dtype)])
+
+        antigas = linhas[linhas < len(empresas_anteriores)]
+        antigas = antigas[empresas_anteriores[antigas] >= 0]
+        np.subtract.at(contagens, (empresas_anteriores[antigas], codigos_anteriores[antigas]), 1)
+        atuais = linhas[empresas.codes[linhas] >= 0]
+        np.add.at(contagens, (empresas.codes[atuais], codigos[atuais]), 1)
+
+        for codigo in np.union1d(empresas_anteriores[antigas], empresas.codes[atuais]):
+            _, linhas_empresa = vencimentos.company_rows(empresas.categories[codigo])
+            dias_empresa = dias_para_vencer[linhas_empresa]
+            vigentes = np.isin(codigos[linhas_empresa], VIGENTES)
+            proximo[codigo] = dias_empresa[vigentes].min() if vigentes.any() else SEM_VENCIMENTO
+
+        novo._estado = (dia, contagens, proximo, portfolio_frame(empresas.categories, contagens, proximo, dia))
+        return novo
+
+
+# Função para classificar uma lista de produtos (por registro ou por categoria/produto/empresa)
+def classify_batch(data, consulta_df):
+    with metricas.timer('lote'):
+        return _classify_batch(data, consulta_df)
+
+
+def _classify_batch(data, consulta_df):
+    if set(CHAVE_REGISTRO).issubset(consulta_df.columns):
+        chave = CHAVE_REGISTRO
+    elif set(CHAVE_TRIPLA).issubset(consulta_df.columns):
+        chave = CHAVE_TRIPLA
+    else:
+        raise ValueError(
+            "A consulta deve conter a coluna NU_REGISTRO_PRODUTO ou as colunas "
+            + ", ".join(CHAVE_TRIPLA)
+        )
+
+    # Comparação como texto para não depender dos tipos inferidos no arquivo enviado
+    consulta = consulta_df[chave].astype(str)
+    if chave == CHAVE_REGISTRO:
+        # Número de registro: uma consulta ao índice por linha, sem junção com a base
+        consulta['NU_REGISTRO_PRODUTO'] = consulta['NU_REGISTRO_PRODUTO'].str.strip()
+        return _result_frame(data, consulta, registration_rows(data, consulta['NU_REGISTRO_PRODUTO'].tolist()))
+
+    # Combinação categoria/produto/empresa: as linhas vêm do índice (todas as da combinação, na ordem da base),
+    # sem junção com a base; cada linha da consulta se repete uma vez por linha encontrada
+    lookup = data['lookup']
+    grupos = [lookup.get(tripla, ()) for tripla in zip(*(consulta[coluna].tolist() for coluna in chave))]
+    repeticoes = np.array([max(len(linhas), 1) for linhas in grupos], dtype=np.int64)
+    linhas = np.full(int(repeticoes.sum()), -1, dtype=np.int64)
+    for inicio, grupo in zip(np.cumsum(repeticoes) - repeticoes, grupos):
+        linhas[inicio:inicio + len(grupo)] = grupo
+    return _result_frame(data, consulta.iloc[np.repeat(np.arange(len(consulta)), repeticoes)], linhas)
+
+
+# Função para separar os números de registro digitados, colados ou lidos por leitor de código
+# Aceita espaços, vírgulas, ponto e vírgula ou quebras de linha entre os números; pontuação dentro do número é ignorada
+def parse_registrations(texto):
+    numeros = [normalize_registration(parte) for parte in re.split(r'[\s,;]+', texto or '')]
+    return [numero for numero in numeros if numero]
+
+
+# Função para normalizar um número de registro: só os dígitos (pontos, traços e espaços são ignorados)
+def normalize_registration(numero):
+    return re.sub(r'\D', '', str(numero))
+
+
+# Função para localizar números de registro na base: uma consulta ao índice por número (-1 se não existir)
+# Os números são normalizados como na caixa de texto (pontuação e espaços ignorados)
+def registration_rows(data, numeros):
+    posicoes = data['posicoes_registro']
+    linhas = np.full(len(numeros), -1, dtype=np.int64)
+    for i, numero in enumerate(numeros):
+        numero = normalize_registration(numero)
+        if numero and len(numero) <= MAX_DIGITOS_REGISTRO:
+            linhas[i] = posicoes.get(int(numero), -1)
+    return linhas
+
+
+# Função para montar o resultado de uma consulta: colunas da consulta, dados da base e classificação do dia
+# Linhas não encontradas (-1) ficam com os dados da base vazios
+def _result_frame(data, consulta, linhas):
+    encontrado = linhas >= 0
+    produtos_df = data['produtos_df']
+    resultado = consulta.reset_index(drop=True)
+    for coluna in produtos_df.columns:
+        if coluna not in resultado.columns:
+            resultado[coluna] = pd.api.extensions.take(produtos_df[coluna].array, linhas, allow_fill=True)
+
+    rotulos = np.full(len(resultado), 'NÃO ENCONTRADO', dtype=object)
+    rotulos[encontrado] = ROTULOS[data['diario'].codigos[linhas[encontrado]]]
+    resultado['CLASSIFICACAO'] = rotulos
+    return resultado
+
+
+# Função para consultar vários números de registro de uma vez (um resultado por número, na ordem informada)
+def lookup_registrations(data, numeros):
+    with metricas.timer('consulta_registro'):
+        consulta = pd.DataFrame({'NU_REGISTRO_PRODUTO': [str(numero).strip() for numero in numeros]})
+        return _result_frame(data, consulta, registration_rows(data, consulta['NU_REGISTRO_PRODUTO'].tolist()))
+
+
+# Função para montar a tabela de algumas linhas da base, com dias para vencer e classificação do dia
+def classified_rows(data, linhas):
+    _, dias_para_vencer, codigos = data['diario'].get()
+    resultado = data['produtos_df'].iloc[linhas].reset_index(drop=True)
+    resultado['DIAS_PARA_VENCER'] = dias_para_vencer[linhas]
+    resultado['CLASSIFICACAO'] = ROTULOS[codigos[linhas]]
+    return resultado
+
+
+# Função para consultar um produto pela combinação categoria/produto/empresa (None se não existir)
+# Consultas repetidas da mesma versão dos dados, no mesmo dia, saem do cache de previsões
+def lookup_product(data, categoria, produto, empresa):
+    with metricas.timer('consulta'):
+        return previsoes.cache.get_or_compute(
+            previsoes.cache_key(data, categoria, produto, empresa),
+            lambda: _lookup_product(data, categoria, produto, empresa)
+        )
+
+
+def _lookup_product(data, categoria, produto, empresa):
+    linhas = data['lookup'].get((categoria, produto, empresa))
+    if linhas is None or len(linhas) == 0:
+        return None
+    return _product_result(data, linhas[0], linhas[1:])
+
+
+# Função para consultar um produto pelo número de registro (None se não existir)
+def lookup_registration(data, numero):
+    with metricas.timer('consulta_registro'):
+        linha = registration_rows(data, [numero])[0]
+        return _product_result(data, linha, []) if linha >= 0 else None
+
+
+# Função para montar o resultado da consulta de uma linha (outras: demais linhas da mesma combinação)
+def _product_result(data, linha, outras):
+    product_info = data['registros'][linha]
+
+    # Classificação do dia: leitura direta no array pré-calculado
+    classificacao = ROTULOS[data['diario'].codigos[linha]]
+
+    validade = product_info['DT_VENCIMENTO_REGISTRO']
+
+    return {
+        'classificacao': classificacao,
+        'validade': validade.strftime('%Y-%m-%d') if pd.notna(validade) else '-',
+        'categoria': product_info['DS_CATEGORIA_PRODUTO'],
+        'produto': product_info['NO_PRODUTO'],
+        'empresa': product_info['NO_RAZAO_SOCIAL_EMPRESA'],
+        'registro': product_info['NU_REGISTRO_PRODUTO'],
+        'outros_registros': [data['registros'][i]['NU_REGISTRO_PRODUTO'] for i in outras]
+    }
+
+
+# Função para calcular a distribuição das classificações (total e por categoria)
+def compute_stats(data):
+    produtos_df = data['produtos_df']
+
+    # Um único agrupamento categoria × classificação alimenta os cards e o detalhamento
+    por_categoria = pd.crosstab(
+        np.asarray(produtos_df['DS_CATEGORIA_PRODUTO'], dtype=object),
+        np.asarray(data['diario'].categorical(), dtype=object)
+    )
+    por_categoria = por_categoria.reindex(
+        columns=CLASSES + [c for c in por_categoria.columns if c not in CLASSES],
+        fill_value=0
+    )
+    por_categoria.index.name = 'Categoria'
+    por_categoria.columns.name = None
+
+    totais = por_categoria.sum()
+    total = int(totais.sum())
+    return {
+        'total': total,
+        'contagens': totais.to_dict(),
+        'percentuais': (totais / total * 100 if total else totais * 0.0).to_dict(),
+        'por_categoria': por_categoria
+    }
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# Publicação dos arrays somente leitura em arquivos .npy mapeados em memória
+# O primeiro processo que precisar dos dados grava os arrays; os demais (e ele mesmo) apenas os mapeiam,
+# de modo que todos os workers de uma máquina compartilham as mesmas páginas do cache do sistema operacional
+
+CACHE_DIR = 'data/cache'
+METADATA_FILE = 'colunas.json'
+ENV_DESATIVADO = 'ANVISA_SEM_COMPARTILHAMENTO'
+
+
+# Função para verificar se o compartilhamento entre processos está ativo
+def enabled():
+    return os.environ.get(ENV_DESATIVADO, '').strip().lower() in ('', '0', 'false')
+
+
+# Função para derivar a chave (nome da pasta) a partir da assinatura dos arquivos de origem
+def cache_key(assinatura):
+    return hashlib.sha1(repr(assinatura).encode('utf-8')).hexdigest()[:16]
+
+
+# Função para gravar as colunas de um DataFrame em uma pasta (códigos das categorias, números e datas)
+def _write_frame(produtos_df, pasta):
+    colunas = []
+    for coluna in produtos_df.columns:
+        valores = produtos_df[coluna].array
+        nome_arquivo = f"{len(colunas)}.npy"
+        if isinstance(valores, pd.Categorical):
+            np.save(os.path.join(pasta, nome_arquivo), valores.codes)
+            colunas.append({
+                'nome': coluna,
+                'arquivo': nome_arquivo,
+                'categorias': [str(c) for c in valores.categories]
+            })
+        else:
+            np.save(os.path.join(pasta, nome_arquivo), produtos_df[coluna].to_numpy())
+            colunas.append({'nome': coluna, 'arquivo': nome_arquivo})
+
+    with open(os.path.join(pasta, METADATA_FILE), 'w', encoding='utf-8') as f:
+        json.dump({'linhas': len(produtos_df), 'colunas': colunas}, f, ensure_ascii=False)
+
+
+# Função para montar o DataFrame sobre os arrays mapeados em memória (sem cópia)
+def _attach_frame(pasta):
+    with open(os.path.join(pasta, METADATA_FILE), encoding='utf-8') as f:
+        metadados = json.load(f)
+
+    colunas = {}
+    for coluna in metadados['colunas']:
+        valores = np.load(os.path.join(pasta, coluna['arquivo']), mmap_mode='r', allow_pickle=False)
+        if 'categorias' in coluna:
+            valores = pd.Categorical.from_codes(valores, dtype=pd.CategoricalDtype(coluna['categorias']))
+        colunas[coluna['nome']] = valores
+    return pd.DataFrame(colunas, copy=False)
+
+
+# Função para remover publicações antigas (em sistemas que não permitem apagar arquivos mapeados, ignora)
+def _cleanup(cache_dir, manter):
+    for nome in os.listdir(cache_dir):
+        if nome != manter and not nome.startswith('.'):
+            shutil.rmtree(os.path.join(cache_dir, nome), ignore_errors=True)
+
+
+# Função para obter o DataFrame compartilhado: mapeia a publicação existente ou publica uma nova
+def load_frame(assinatura, construir, cache_dir=CACHE_DIR):
+    pasta = os.path.join(cache_dir, cache_key(assinatura))
+    if not os.path.exists(os.path.join(pasta, METADATA_FILE)):
+        os.makedirs(cache_dir, exist_ok=True)
+        produtos_df = construir()
+
+        # Grava em pasta temporária e publica com um único rename; se outro processo publicou antes, usa a dele
+        tmp_dir = tempfile.mkdtemp(prefix='.tmp-', dir=cache_dir)
+        try:
+            _write_frame(produtos_df, tmp_dir)
+            os.rename(tmp_dir, pasta)
+        except OSError:
+            if not os.path.exists(os.path.join(pasta, METADATA_FILE)):
+                raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        _cleanup(cache_dir, os.path.basename(pasta))
+
+    return _attach_frame(pasta)
@@ -0,0 +1,767 @@
+import argparse
+import itertools
+import math
+import os
+import pickle
+import sys
+import threading
+import time
+import traceback
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+
+import avaliacao
+import busca
+import classificacao
+import compartilhado
+import floresta
+import metricas
+import modelo
+import vencimentos
+import vocabulario
+
+# pyarrow é opcional: sem ele a aplicação continua lendo o CSV
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+    feather = None
+
+CSV_PATH = 'data/produtos_classificados.csv'
+FEATHER_PATH = 'data/produtos_classificados.feather'
+
+# Colunas de texto com muitos valores repetidos, guardadas como categorias
+CATEGORICAL_COLUMNS = [
+    'DS_CATEGORIA_PRODUTO',
+    'NO_PRODUTO',
+    'NO_RAZAO_SOCIAL_EMPRESA',
+    'ST_SITUACAO_REGISTRO'
+]
+DATE_COLUMNS = ['DT_VENCIMENTO_REGISTRO']
+
+# Colunas categóricas com valores quase únicos (um por registro): gravadas como texto simples no Feather e
+# convertidas em categorias na leitura, para que a ingestão não guarde um vocabulário do tamanho do arquivo
+TEXT_COLUMNS = ['NO_PRODUTO']
+
+# Colunas efetivamente usadas pela aplicação (as demais são descartadas na ingestão)
+USED_COLUMNS = ['NU_REGISTRO_PRODUTO'] + CATEGORICAL_COLUMNS + DATE_COLUMNS
+
+# Linhas lidas por bloco na ingestão do CSV
+CHUNK_SIZE = 100000
+
+# Intervalo (segundos) entre as verificações de arquivos alterados
+RELOAD_INTERVAL = 30
+
+# Pasta dos arquivos de atualização incremental (aplicados em ordem de nome sobre a base)
+DELTA_DIR = 'data/delta'
+
+# Geração de cada snapshot montado no processo (carga completa ou atualização incremental): muda a cada
+# troca, inclusive quando só os encoders mudaram e a versão dos dados (data de modificação) é a mesma
+_geracoes = itertools.count(1)
+
+# Colunas que identificam um produto nos índices
+CHAVE_PRODUTO = ['DS_CATEGORIA_PRODUTO', 'NO_PRODUTO', 'NO_RAZAO_SOCIAL_EMPRESA']
+
+ENCODER_PATHS = {
+    'le_categoria': 'data/le_categoria.pkl',
+    'le_empresa': 'data/le_empresa.pkl',
+    'le_produto': 'data/le_produto.pkl',
+    'le_target': 'data/le_target.pkl'
+}
+
+
+# Função para ler o CSV original já com os tipos corretos
+def read_produtos_csv(path=CSV_PATH):
+    with metricas.timer('leitura_csv'):
+        produtos_df = pd.read_csv(path, sep=',')
+        for coluna in CATEGORICAL_COLUMNS:
+            if coluna in produtos_df.columns:
+                produtos_df[coluna] = produtos_df[coluna].astype('category')
+        for coluna in DATE_COLUMNS:
+            if coluna in produtos_df.columns:
+                produtos_df[coluna] = pd.to_datetime(produtos_df[coluna], errors='coerce')
+    return produtos_df
+
+
+# Função para verificar se o arquivo colunar está atualizado em relação ao CSV
+def is_feather_fresh(csv_path=CSV_PATH, feather_path=FEATHER_PATH):
+    if feather is None or not os.path.exists(feather_path):
+        return False
+    if not os.path.exists(csv_path):
+        return True
+    return os.path.getmtime(feather_path) >= os.path.getmtime(csv_path)
+
+
+# Vocabulário incremental de uma coluna de texto: cada valor distinto é guardado uma única vez
+# O dicionário do Arrow só é refeito nos blocos que trazem valores novos, acrescentando-os ao final
+class _Vocabulary:
+    def __init__(self):
+        self.codigos = {}
+        self.dicionario = pa.array([], type=pa.string())
+
+    # Converte um bloco da coluna em códigos, acrescentando ao vocabulário os valores novos
+    def encode(self, coluna):
+        categorias = pd.Categorical(coluna)
+        mapa = np.empty(len(categorias.categories), dtype=np.int32)
+        novos = []
+        for i, valor in enumerate(categorias.categories):
+            codigo = self.codigos.get(valor)
+            if codigo is None:
+                codigo = len(self.codigos)
+                self.codigos[valor] = codigo
+                novos.append(valor)
+            mapa[i] = codigo
+        if novos:
+            self.dicionario = pa.concat_arrays([self.dicionario, pa.array(novos, type=pa.string())])
+
+        validos = categorias.codes >= 0
+        codigos = np.zeros(len(categorias), dtype=np.int32)
+        codigos[validos] = mapa[categorias.codes[validos]]
+
+        # O dicionário só cresce, então o Arrow grava apenas os valores novos (delta) a cada bloco
+        return pa.DictionaryArray.from_arrays(pa.array(codigos, mask=~validos), self.dicionario)
+
+
+# Função para converter o CSV no formato colunar (Arrow/Feather), lendo em blocos
+# A memória usada depende do tamanho do bloco e da quantidade de valores distintos das colunas com dicionário
+# (TEXT_COLUMNS vão como texto simples), não do tamanho do arquivo
+def build_feather(csv_path=CSV_PATH, feather_path=FEATHER_PATH, tamanho_bloco=CHUNK_SIZE):
+    if feather is None:
+        raise RuntimeError("pyarrow não está instalado; não é possível gerar o arquivo Feather")
+
+    schema = pa.schema(
+        [('NU_REGISTRO_PRODUTO', pa.int64())]
+        + [
+            (coluna, pa.string() if coluna in TEXT_COLUMNS else pa.dictionary(pa.int32(), pa.string()))
+            for coluna in CATEGORICAL_COLUMNS
+        ]
+        + [(coluna, pa.timestamp('ns')) for coluna in DATE_COLUMNS]
+    )
+    vocabularios = {coluna: _Vocabulary() for coluna in CATEGORICAL_COLUMNS if coluna not in TEXT_COLUMNS}
+    blocos = pd.read_csv(
+        csv_path,
+        sep=',',
+        usecols=USED_COLUMNS,
+        dtype={coluna: str for coluna in CATEGORICAL_COLUMNS + DATE_COLUMNS},
+        chunksize=tamanho_bloco
+    )
+
+    # Sem compressão para que o arquivo possa ser mapeado em memória na leitura;
+    # grava em arquivo temporário para nunca expor um arquivo pela metade
+    tmp_path = feather_path + '.tmp'
+    total = 0
+    opcoes = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+    with pa.OSFile(tmp_path, 'wb') as destino, pa.ipc.new_file(destino, schema, options=opcoes) as escritor:
+        for bloco in blocos:
+            colunas = [pa.array(bloco['NU_REGISTRO_PRODUTO'].to_numpy(), type=pa.int64())]
+            colunas += [
+                pa.array(bloco[coluna], type=pa.string()) if coluna in TEXT_COLUMNS
+                else vocabularios[coluna].encode(bloco[coluna])
+                for coluna in CATEGORICAL_COLUMNS
+            ]
+            colunas += [
+                pa.array(pd.to_datetime(bloco[coluna], errors='coerce'), type=pa.timestamp('ns'))
+                for coluna in DATE_COLUMNS
+            ]
+            escritor.write_batch(pa.record_batch(colunas, schema=schema))
+            total += len(bloco)
+    os.replace(tmp_path, feather_path)
+    return total
+
+
+# Função para carregar os produtos: Feather mapeado em memória ou, se ausente/desatualizado, o CSV
+def read_produtos(csv_path=CSV_PATH, feather_path=FEATHER_PATH):
+    if is_feather_fresh(csv_path, feather_path):
+        with metricas.timer('leitura_feather'):
+            tabela = feather.read_table(feather_path, memory_map=True)
+            produtos_df = tabela.to_pandas(split_blocks=True)
+            for coluna in TEXT_COLUMNS:
+                if coluna in produtos_df.columns:
+                    produtos_df[coluna] = produtos_df[coluna].astype('category')
+            return produtos_df
+    return read_produtos_csv(csv_path)
+
+
+# Função para identificar a versão dos dados (data de modificação do arquivo de origem)
+def produtos_version(csv_path=CSV_PATH, feather_path=FEATHER_PATH):
+    caminho = feather_path if is_feather_fresh(csv_path, feather_path) else csv_path
+    return os.path.getmtime(caminho)
+
+
+# Função para calcular a assinatura dos arquivos de produtos (identifica a publicação compartilhada)
+def produtos_signature(csv_path=CSV_PATH, feather_path=FEATHER_PATH):
+    assinatura = []
+    for caminho in (csv_path, feather_path):
+        if os.path.exists(caminho):
+            info = os.stat(caminho)
+            assinatura.append((os.path.abspath(caminho), info.st_mtime_ns, info.st_size))
+    return tuple(assinatura)
+
+
+# Função para carregar os produtos compartilhados entre processos (arrays mapeados em memória)
+# Só as colunas usadas são publicadas, como na ingestão para Feather
+def read_produtos_shared(csv_path=CSV_PATH, feather_path=FEATHER_PATH):
+    def construir():
+        produtos_df = read_produtos(csv_path, feather_path)
+        return produtos_df[[coluna for coluna in USED_COLUMNS if coluna in produtos_df.columns]]
+
+    if not compartilhado.enabled():
+        return read_produtos(csv_path, feather_path)
+    try:
+        with metricas.timer('leitura_compartilhada'):
+            return compartilhado.load_frame(produtos_signature(csv_path, feather_path), construir)
+    except OSError:
+        # Sem permissão de escrita na pasta de cache, por exemplo: cada processo carrega a sua cópia
+        traceback.print_exc()
+        return construir()
+
+
+# Acesso por linha às colunas da base, sem materializar um dicionário por registro
+# Os valores vêm dos arrays (compartilhados) e são convertidos só na leitura, como em to_dict('records')
+class Records:
+    def __init__(self, produtos_df):
+        self._colunas = {}
+        for coluna in produtos_df.columns:
+            valores = produtos_df[coluna].array
+            if isinstance(valores, pd.Categorical):
+                self._colunas[coluna] = (valores.codes, np.asarray(valores.categories, dtype=object))
+            else:
+                self._colunas[coluna] = (produtos_df[coluna].to_numpy(), None)
+        self._tamanho = len(produtos_df)
+
+    def __len__(self):
+        return self._tamanho
+
+    # Valor de uma coluna na linha informada
+    def value(self, linha, coluna):
+        valores, categorias = self._colunas[coluna]
+        valor = valores[linha]
+        if categorias is not None:
+            return categorias[valor] if valor >= 0 else np.nan
+        if isinstance(valor, np.datetime64):
+            return pd.Timestamp(valor)
+        return valor.item() if isinstance(valor, np.generic) else valor
+
+    def __getitem__(self, linha):
+        return {coluna: self.value(linha, coluna) for coluna in self._colunas}
+
+
+# Função para verificar se existe algum arquivo de produtos disponível
+def produtos_file_exists(csv_path=CSV_PATH, feather_path=FEATHER_PATH):
+    return os.path.exists(csv_path) or (feather is not None and os.path.exists(feather_path))
+
+
+
+# Função para listar os arquivos necessários que estão faltando
+def missing_files():
+    with metricas.timer('check_files'):
+        missing = [
+            caminho for nome, caminho in ENCODER_PATHS.items()
+            if not os.path.exists(caminho) and not vocabulary_exists(nome)
+        ]
+        if not modelo.model_file_exists():
+            missing.append(modelo.XZ_PATH)
+        if not produtos_file_exists():
+            missing.append(CSV_PATH)
+    return missing
+
+
+# Função para carregar LabelEncoders
+def load_label_encoder(filepath):
+    try:
+        with metricas.timer('load_label_encoder'), open(filepath, 'rb') as f:
+            obj = pickle.load(f)
+    except Exception as e:
+        raise RuntimeError(f"Erro ao carregar {filepath}: {str(e)}") from e
+
+    # Caso 1: Já é um LabelEncoder
+    if isinstance(obj, LabelEncoder):
+        return obj
+
+    # Caso 2: É um array numpy com as classes
+    encoder = LabelEncoder()
+    encoder.classes_ = obj
+    return encoder
+
+
+# Função para verificar se um vocabulário já foi convertido para o formato em arrays
+def vocabulary_exists(nome):
+    return all(os.path.exists(caminho) for caminho in vocabulario.vocabulary_paths(nome))
+
+
+# Função para carregar um vocabulário: arrays mapeados em memória (sem pickle) quando disponíveis e não mais
+# antigos que o .pkl; senão, o LabelEncoder em pickle convertido em memória
+def load_vocabulary(nome, caminho_pickle):
+    if vocabulary_exists(nome):
+        caminho_textos = vocabulario.vocabulary_paths(nome)[0]
+        if not os.path.exists(caminho_pickle) or os.path.getmtime(caminho_textos) >= os.path.getmtime(caminho_pickle):
+            with metricas.timer('load_vocabulary'):
+                return vocabulario.Vocabulary.load(nome)
+    return vocabulario.Vocabulary.from_values(load_label_encoder(caminho_pickle).classes_)
+
+
+# Função para construir o índice categoria → produto → empresa → linhas
+# Direto dos códigos das categóricas: as linhas são ordenadas por (categoria, produto, empresa) em ordem
+# alfabética e cortadas onde a combinação muda; dentro de cada combinação ficam na ordem da base
+def build_index(produtos_df):
+    colunas = [produtos_df[coluna].array for coluna in CHAVE_PRODUTO]
+    validas = np.flatnonzero(np.logical_and.reduce([coluna.codes >= 0 for coluna in colunas]))
+
+    # Posição alfabética de cada código, para que a ordenação dos códigos siga a ordem dos nomes
+    postos = []
+    for coluna in colunas:
+        ordem = np.argsort(coluna.categories.to_numpy(dtype=object), kind='stable')
+        posto = np.empty(len(ordem), dtype=np.int64)
+        posto[ordem] = np.arange(len(ordem))
+        postos.append(posto[coluna.codes[validas]])
+    linhas = validas[np.lexsort(postos[::-1])]
+
+    codigos = [coluna.codes[linhas] for coluna in colunas]
+    mudancas = np.logical_or.reduce([codigo[1:] != codigo[:-1] for codigo in codigos])
+    inicios = np.flatnonzero(np.concatenate([[len(linhas) > 0], mudancas]))
+    nomes = [coluna.categories[codigo[inicios]].tolist() for coluna, codigo in zip(colunas, codigos)]
+
+    # Inserção em ordem alfabética: cada nível do dicionário já fica ordenado
+    indice = {}
+    for categoria, produto, empresa, grupo in zip(*nomes, np.split(linhas, inicios[1:])):
+        indice.setdefault(categoria, {}).setdefault(produto, {})[empresa] = grupo
+    return indice
+
+
+# Função para construir o índice (categoria, produto, empresa) → posições das linhas
+def build_lookup(indice):
+    lookup = {}
+    for categoria, produtos in indice.items():
+        for produto, empresas in produtos.items():
+            for empresa, linhas in empresas.items():
+                lookup[(categoria, produto, empresa)] = linhas
+    return lookup
+
+
+# Função para construir o índice número de registro → posição da linha (primeira ocorrência)
+def build_registration_index(produtos_df):
+    numeros = produtos_df['NU_REGISTRO_PRODUTO'].to_numpy()
+    return dict(zip(numeros[::-1].tolist(), range(len(numeros) - 1, -1, -1)))
+
+
+# Função para listar os arquivos de atualização incremental (caminho, data de modificação, tamanho), em ordem
+# Quem gera os arquivos deve gravá-los com outro nome e renomear no final, para nunca expor um arquivo pela metade
+def delta_signature(pasta=DELTA_DIR):
+    if not os.path.isdir(pasta):
+        return ()
+    assinatura = []
+    for nome in sorted(os.listdir(pasta)):
+        if nome.endswith('.csv'):
+            info = os.stat(os.path.join(pasta, nome))
+            assinatura.append((os.path.join(pasta, nome), info.st_mtime_ns, info.st_size))
+    return tuple(assinatura)
+
+
+# Função para ler um arquivo de atualização: NU_REGISTRO_PRODUTO e as colunas enviadas
+# Registro novo é incluído; registro existente só tem alteradas as células preenchidas (vazio mantém o valor)
+# Uma desativação é só o número do registro com ST_SITUACAO_REGISTRO=INATIVO
+# Números com pontuação são normalizados como na consulta; linhas sem número válido são ignoradas (e informadas)
+def read_delta(caminho):
+    delta = pd.read_csv(caminho, sep=',', dtype=str, keep_default_na=False)
+    if 'NU_REGISTRO_PRODUTO' not in delta.columns:
+        raise ValueError(f"{caminho}: o arquivo de atualização deve conter a coluna NU_REGISTRO_PRODUTO")
+    delta = delta[[coluna for coluna in USED_COLUMNS if coluna in delta.columns]].copy()
+
+    numeros = delta['NU_REGISTRO_PRODUTO'].map(classificacao.normalize_registration)
+    invalidos = (numeros.str.len() == 0) | (numeros.str.len() > classificacao.MAX_DIGITOS_REGISTRO)
+    if invalidos.any():
+        # Linha no arquivo = posição + 2 (cabeçalho e numeração a partir de 1)
+        linhas = ', '.join(str(i + 2) for i in np.flatnonzero(invalidos.to_numpy())[:10])
+        print(
+            f"{caminho}: {int(invalidos.sum())} linha(s) ignorada(s) com NU_REGISTRO_PRODUTO inválido (linhas {linhas})",
+            file=sys.stderr
+        )
+    delta = delta[~invalidos].assign(NU_REGISTRO_PRODUTO=numeros[~invalidos].astype(np.int64))
+
+    # Registro repetido no mesmo arquivo: vale a última linha
+    return delta.drop_duplicates('NU_REGISTRO_PRODUTO', keep='last').reset_index(drop=True)
+
+
+# Função para aplicar valores novos a uma coluna categórica (categorias novas entram no final da lista,
+# então os códigos existentes continuam valendo)
+def _merge_categorical(valores, total, linhas, textos):
+    posicoes = valores.categories.get_indexer(textos)
+    desconhecidos = posicoes < 0
+    dtype = valores.dtype
+    if desconhecidos.any():
+        novas = pd.Index(pd.unique(textos[desconhecidos]))
+        posicoes[desconhecidos] = len(valores.categories) + novas.get_indexer(textos[desconhecidos])
+        dtype = pd.CategoricalDtype(valores.categories.append(novas))
+
+    codigos = np.full(total, -1, dtype=np.int64 if len(dtype.categories) > np.iinfo(np.int32).max else np.int32)
+    codigos[:len(valores)] = valores.codes
+    codigos[linhas] = posicoes
+    return pd.Categorical.from_codes(codigos, dtype=dtype)
+
+
+# Função para aplicar um arquivo de atualização sobre a base; retorna (nova base, linhas alteradas, registros novos)
+# As linhas existentes mantêm a posição e os registros novos entram no final
+def merge_delta(produtos_df, posicoes_registro, delta):
+    numeros = delta['NU_REGISTRO_PRODUTO'].to_numpy()
+    linhas = np.fromiter((posicoes_registro.get(n, -1) for n in numeros.tolist()), dtype=np.int64, count=len(numeros))
+    novas = linhas < 0
+    total = len(produtos_df) + int(novas.sum())
+    linhas[novas] = np.arange(len(produtos_df), total)
+
+    colunas = {}
+    for coluna in produtos_df.columns:
+        serie = produtos_df[coluna]
+        if coluna == 'NU_REGISTRO_PRODUTO':
+            colunas[coluna] = np.concatenate([serie.to_numpy(), numeros[novas]])
+            continue
+
+        textos = delta[coluna].to_numpy(dtype=object) if coluna in delta.columns else np.full(len(delta), '', dtype=object)
+        preencher = textos != ''
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            colunas[coluna] = _merge_categorical(serie.array, total, linhas[preencher], textos[preencher])
+            continue
+
+        valores = np.array(serie.reindex(pd.RangeIndex(total)).to_numpy(), copy=True)
+        if np.issubdtype(valores.dtype, np.datetime64):
+            valores[linhas[preencher]] = pd.to_datetime(pd.Series(textos[preencher], dtype=object), errors='coerce').to_numpy()
+        elif valores.dtype == object:
+            valores[linhas[preencher]] = textos[preencher]
+        else:
+            valores[linhas[preencher]] = pd.to_numeric(pd.Series(textos[preencher], dtype=object), errors='coerce').to_numpy()
+        colunas[coluna] = valores
+
+    novos = dict(zip(numeros[novas].tolist(), linhas[novas].tolist()))
+    return pd.DataFrame(colunas, copy=False), linhas, novos
+
+
+# Função para listar (categoria, produto, empresa) de algumas linhas; None quando falta algum dos valores
+def _row_keys(produtos_df, linhas):
+    colunas = [np.asarray(produtos_df[coluna].array[linhas], dtype=object) for coluna in CHAVE_PRODUTO]
+    return [
+        chave if all(isinstance(valor, str) for valor in chave) else None
+        for chave in zip(*colunas)
+    ]
+
+
+# Função para atualizar o índice em cascata e o lookup só nas chaves das linhas alteradas
+# Os níveis do caminho até cada chave alterada são copiados (o snapshot anterior continua intacto)
+# Retorna (indice, lookup, {categoria: (produtos incluídos, produtos removidos)})
+def patch_index(indice, lookup, anterior_df, produtos_df, linhas):
+    antigas = linhas[linhas < len(anterior_df)]
+    alteracoes = {}
+    for chave, linha in zip(_row_keys(anterior_df, antigas), antigas.tolist()):
+        if chave is not None:
+            alteracoes.setdefault(chave, ([], []))[0].append(linha)
+    for chave, linha in zip(_row_keys(produtos_df, linhas), linhas.tolist()):
+        if chave is not None:
+            alteracoes.setdefault(chave, ([], []))[1].append(linha)
+
+    indice_anterior = indice
+    indice = dict(indice)
+    lookup = dict(lookup)
+    copiados = set()
+    for chave, (remover, adicionar) in alteracoes.items():
+        atual = lookup.get(chave, np.array([], dtype=np.int64))
+        novas = np.union1d(np.setdiff1d(atual, remover), adicionar).astype(np.int64)
+        if np.array_equal(novas, atual):
+            continue
+
+        categoria, produto, empresa = chave
+        if categoria not in copiados:
+            indice[categoria] = dict(indice.get(categoria, {}))
+            copiados.add(categoria)
+        if (categoria, produto) not in copiados:
+            indice[categoria][produto] = dict(indice[categoria].get(produto, {}))
+            copiados.add((categoria, produto))
+
+        empresas = indice[categoria][produto]
+        if len(novas):
+            lookup[chave] = empresas[empresa] = novas
+        else:
+            lookup.pop(chave, None)
+            empresas.pop(empresa, None)
+
+    # Remove níveis que ficaram vazios e mantém a ordem alfabética onde entraram nomes novos
+    produtos_alterados = {}
+    for item in copiados:
+        if not isinstance(item, tuple):
+            continue
+        categoria, produto = item
+        produtos = indice[categoria]
+        existia = produto in indice_anterior.get(categoria, {})
+        if not produtos[produto]:
+            del produtos[produto]
+            if existia:
+                produtos_alterados.setdefault(categoria, ([], []))[1].append(produto)
+        else:
+            produtos[produto] = dict(sorted(produtos[produto].items()))
+            if not existia:
+                produtos_alterados.setdefault(categoria, ([], []))[0].append(produto)
+
+    for categoria in [c for c in copiados if not isinstance(c, tuple)]:
+        if not indice[categoria]:
+            del indice[categoria]
+        elif produtos_alterados.get(categoria, ([], []))[0]:
+            indice[categoria] = dict(sorted(indice[categoria].items()))
+    if any(categoria not in indice_anterior for categoria in indice):
+        indice = dict(sorted(indice.items()))
+
+    return indice, lookup, produtos_alterados
+
+
+# Função para aplicar um arquivo de atualização a um snapshot, gerando o próximo
+# Só as linhas do arquivo são reclassificadas e reindexadas; as estruturas sem mudança são compartilhadas
+def apply_delta(data, delta, versao):
+    with metricas.timer('atualizacao_incremental'):
+        anterior_df = data['produtos_df']
+        produtos_df, linhas, novos = merge_delta(anterior_df, data['posicoes_registro'], delta)
+        antigas = linhas[linhas < len(anterior_df)]
+
+        indice, lookup, produtos_alterados = patch_index(data['indice'], data['lookup'], anterior_df, produtos_df, linhas)
+        busca_produtos = dict(data['busca_produtos'])
+        for categoria, (adicionados, removidos) in produtos_alterados.items():
+            if categoria in busca_produtos:
+                busca_produtos[categoria] = busca_produtos[categoria].updated(adicionados, removidos)
+            else:
+                busca_produtos[categoria] = busca.SearchIndex(adicionados)
+
+        # Empresas que perderam registros só saem da busca se não sobrar nenhuma linha delas
+        empresas = produtos_df['NO_RAZAO_SOCIAL_EMPRESA'].array
+        atuais = {e for e in np.asarray(empresas[linhas], dtype=object) if isinstance(e, str)}
+        candidatas = [
+            e for e in set(np.asarray(anterior_df['NO_RAZAO_SOCIAL_EMPRESA'].array[antigas], dtype=object))
+            if isinstance(e, str) and e not in atuais
+        ]
+        restantes = np.isin(empresas.categories.get_indexer(candidatas), empresas.codes)
+        busca_empresas = data['busca_empresas'].updated(
+            atuais, [empresa for empresa, resta in zip(candidatas, restantes) if not resta]
+        )
+
+        vencimento = data['vencimentos'].patched(produtos_df, anterior_df, linhas)
+        diario = data['diario'].patched(produtos_df, linhas)
+        carteiras = data['carteiras'].patched(produtos_df, diario, data['diario'], linhas, vencimento)
+        posicoes_registro = dict(data['posicoes_registro'])
+        posicoes_registro.update(novos)
+        # Sempre maior que a versão anterior (mesmo com arquivo de data antiga): os caches por versão
+        # (estatísticas, avaliação, previsões) não reaproveitam resultados da base sem a atualização
+        versao = max(versao, math.nextafter(data['versao'], math.inf))
+
+    encoders = {nome: data[nome] for nome in ENCODER_PATHS}
+    return {
+        **data,
+        'produtos_df': produtos_df,
+        'versao': versao,
+        'geracao': next(_geracoes),
+        'registros': Records(produtos_df),
+        'indice': indice,
+        'lookup': lookup,
+        'posicoes_registro': posicoes_registro,
+        'busca_produtos': busca_produtos,
+        'busca_empresas': busca_empresas,
+        'vencimentos': vencimento,
+        'diario': diario,
+        'carteiras': carteiras,
+        'avaliacao': avaliacao.ModelEvaluation(
+            produtos_df, encoders, diario, versao, data['modelo'].get, assinatura_encoders=data['assinatura_encoders']
+        )
+    }
+
+
+# Função para aplicar, em ordem, os arquivos de atualização de uma assinatura (ver delta_signature)
+# Um arquivo com erro é informado e pulado (a base e os demais arquivos continuam valendo); ele fica registrado
+# como visto, então só é lido de novo quando for alterado (o que provoca uma recarga completa)
+def apply_deltas(data, assinatura):
+    for caminho, mtime_ns, tamanho in assinatura:
+        try:
+            data = apply_delta(data, read_delta(caminho), mtime_ns / 1e9)
+        except Exception:
+            print(f"{caminho}: arquivo de atualização ignorado", file=sys.stderr)
+            traceback.print_exc()
+            data = dict(data)
+        data['atualizacoes'] = data.get('atualizacoes', ()) + ((caminho, mtime_ns, tamanho),)
+    return data
+
+
+# Função para incorporar as atualizações à base (CSV e, se existir, Feather) e remover os arquivos aplicados
+def consolidate(csv_path=CSV_PATH, feather_path=FEATHER_PATH, pasta=DELTA_DIR):
+    assinatura = delta_signature(pasta)
+    if not assinatura:
+        return 0
+
+    produtos_df = read_produtos_csv(csv_path) if os.path.exists(csv_path) else read_produtos(csv_path, feather_path)
+    posicoes_registro = build_registration_index(produtos_df)
+    for caminho, _, _ in assinatura:
+        produtos_df, _, novos = merge_delta(produtos_df, posicoes_registro, read_delta(caminho))
+        posicoes_registro.update(novos)
+
+    tmp_path = csv_path + '.tmp'
+    produtos_df.to_csv(tmp_path, index=False, date_format='%Y-%m-%d')
+    os.replace(tmp_path, csv_path)
+    if feather is not None and os.path.exists(feather_path):
+        build_feather(csv_path, feather_path)
+    for caminho, _, _ in assinatura:
+        os.remove(caminho)
+    return len(assinatura)
+
+
+# Função para carregar encoders, modelo (sob demanda), produtos e índices
+# Usada tanto pela aplicação Streamlit quanto pelo serviço sem interface (servico.py)
+def load_bundle():
+    # Carregar vocabulários (categoria, empresa, produto e classe alvo)
+    # A assinatura dos arquivos entra na chave da avaliação do modelo (encoders novos mudam as previsões)
+    assinatura_encoders = paths_signature(encoder_files())
+    encoders = {nome: load_vocabulary(nome, caminho) for nome, caminho in ENCODER_PATHS.items()}
+
+    # Carregar dados (arquivo colunar quando disponível, senão o CSV), compartilhados entre os processos da máquina
+    versao = produtos_version()
+    produtos_df = read_produtos_shared()
+
+    # Índices usados pelos filtros em cascata, pela consulta individual e pela busca por nome
+    with metricas.timer('indices'):
+        indice = build_index(produtos_df)
+        lookup = build_lookup(indice)
+        busca_produtos = {categoria: busca.SearchIndex(produtos) for categoria, produtos in indice.items()}
+        busca_empresas = busca.SearchIndex({empresa for _, _, empresa in lookup})
+        vencimento = vencimentos.ExpiryIndex(produtos_df)
+
+    diario = classificacao.DailyClassification(produtos_df)
+    modelo_preguicoso = modelo.LazyModel()
+
+    data = {
+        **encoders,
+        # Modelo carregado sob demanda (ou em segundo plano depois que a página é exibida)
+        'modelo': modelo_preguicoso,
+        'produtos_df': produtos_df,
+        'versao': versao,
+        'geracao': next(_geracoes),
+        'registros': Records(produtos_df),
+        'indice': indice,
+        'lookup': lookup,
+        'posicoes_registro': build_registration_index(produtos_df),
+        # Busca aproximada por nome: produtos de cada categoria e todas as empresas
+        'busca_produtos': busca_produtos,
+        'busca_empresas': busca_empresas,
+        # Linhas ordenadas por data de vencimento, para as consultas por prazo
+        'vencimentos': vencimento,
+        # Dias para vencer e classificação de toda a base, recalculados uma vez por dia
+        'diario': diario,
+        # Resumo por empresa (contagem por classificação e próximo vencimento), também recalculado por dia
+        'carteiras': classificacao.CompanyPortfolio(produtos_df, diario),
+        # Métricas do modelo sobre a base atual, calculadas em segundo plano (pool de processos)
+        'assinatura_encoders': assinatura_encoders,
+        'avaliacao': avaliacao.ModelEvaluation(
+            produtos_df, encoders, diario, versao, modelo_preguicoso.get, assinatura_encoders=assinatura_encoders
+        ),
+        # Arquivos de atualização incremental já aplicados a este snapshot
+        'atualizacoes': ()
+    }
+
+    # Atualizações incrementais pendentes (ainda não consolidadas na base)
+    return apply_deltas(data, delta_signature())
+
+
+
+# Função para calcular a assinatura dos arquivos de dados (caminho, data de modificação, tamanho)
+def files_signature():
+    caminhos = encoder_files() + [CSV_PATH, FEATHER_PATH]
+    caminhos += [caminho for caminho, _ in modelo.model_candidates()]
+    caminhos.append(floresta.metadata_path())
+    return paths_signature(caminhos)
+
+
+# Função para listar os arquivos dos encoders (pickles e vocabulários em arrays)
+def encoder_files():
+    caminhos = list(ENCODER_PATHS.values())
+    caminhos += [caminho for nome in ENCODER_PATHS for caminho in vocabulario.vocabulary_paths(nome)]
+    return caminhos
+
+
+# Função para calcular a assinatura (caminho, data de modificação, tamanho) dos arquivos que existem
+def paths_signature(caminhos):
+    assinatura = []
+    for caminho in caminhos:
+        if os.path.exists(caminho):
+            info = os.stat(caminho)
+            assinatura.append((caminho, info.st_mtime_ns, info.st_size))
+    return tuple(assinatura)
+
+
+# Snapshot atual dos dados, recarregado em segundo plano quando os arquivos mudam
+# Quem já pegou um snapshot continua com ele até o fim da requisição; novas requisições veem o novo
+class BundleRepository:
+    def __init__(self, loader=load_bundle, intervalo=RELOAD_INTERVAL):
+        self._loader = loader
+        self._intervalo = intervalo
+        self._lock = threading.Lock()
+        self._thread = None
+        self._assinatura = files_signature()
+        self._atual = loader()
+
+    # Retorna o snapshot atual (leitura de uma única referência, sem bloqueio)
+    def current(self):
+        return self._atual
+
+    # Recarrega os dados se algum arquivo mudou; retorna True quando houve troca de snapshot
+    def reload_if_changed(self):
+        with self._lock:
+            assinatura = files_signature()
+            atualizacoes = delta_signature()
+            aplicadas = self._atual.get('atualizacoes', ())
+            if assinatura == self._assinatura and atualizacoes == aplicadas:
+                return False
+
+            anterior = self._atual
+            if assinatura == self._assinatura and atualizacoes[:len(aplicadas)] == aplicadas:
+                # Só chegaram arquivos de atualização novos: aplica sobre o snapshot atual
+                novo = apply_deltas(anterior, atualizacoes[len(aplicadas):])
+            else:
+                novo = self._loader()
+
+            # Prepara o novo snapshot antes da troca para a primeira requisição não pagar por isso
+            novo['diario'].get()
+            novo['carteiras'].get()
+            if anterior['modelo'].loaded:
+                novo['modelo'].get()
+
+            self._atual = novo
+            self._assinatura = assinatura
+            return True
+
+    # Inicia a verificação periódica dos arquivos (uma única vez)
+    def start_watching(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._watch, name='dados-recarga', daemon=True)
+            self._thread.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self._intervalo)
+            try:
+                self.reload_if_changed()
+            except Exception:
+                # Mantém o snapshot anterior; tenta de novo na próxima verificação
+                traceback.print_exc()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Converte produtos_classificados.csv para o formato colunar usado pela aplicação"
+    )
+    parser.add_argument('--csv', default=CSV_PATH)
+    parser.add_argument('--saida', default=FEATHER_PATH)
+    parser.add_argument('--bloco', type=int, default=CHUNK_SIZE, help="linhas lidas por vez")
+    parser.add_argument('--consolidar', action='store_true',
+                        help=f"incorpora as atualizações de {DELTA_DIR} à base (e ao arquivo colunar, se existir)")
+    args = parser.parse_args()
+
+    if args.consolidar:
+        print(f"{consolidate(args.csv, args.saida)} arquivos de atualização incorporados a {args.csv}")
+        sys.exit(0)
+
+    total = build_feather(args.csv, args.saida, args.bloco)
+    print(f"{total} registros gravados em {args.saida}")
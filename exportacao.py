@@ -0,0 +1,106 @@
+import numpy as np
+
+import classificacao
+import metricas
+
+# pyarrow é opcional: sem ele só a exportação em CSV fica disponível
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Linhas convertidas por vez: só um bloco da exportação fica em memória
+CHUNK_SIZE = 10000
+
+FORMATOS = {
+    'csv': ('text/csv', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet')
+}
+
+
+# Função para selecionar as linhas de uma categoria e/ou empresa (todas as linhas sem filtro)
+def select_rows(produtos_df, categoria=None, empresa=None):
+    selecionadas = np.ones(len(produtos_df), dtype=bool)
+    for coluna, valor in (('DS_CATEGORIA_PRODUTO', categoria), ('NO_RAZAO_SOCIAL_EMPRESA', empresa)):
+        if valor is None:
+            continue
+        valores = produtos_df[coluna].array
+        posicao = valores.categories.get_indexer([valor])[0]
+        selecionadas &= (valores.codes == posicao) if posicao >= 0 else False
+    return np.flatnonzero(selecionadas)
+
+
+# Gera os blocos da exportação (DataFrames com classificação do dia); sempre gera ao menos um, para o cabeçalho
+def _chunks(data, linhas, tamanho_bloco):
+    for inicio in range(0, max(len(linhas), 1), tamanho_bloco):
+        with metricas.timer('exportacao_bloco'):
+            bloco = classificacao.classified_rows(data, linhas[inicio:inicio + tamanho_bloco])
+        yield bloco
+
+
+# Função geradora da exportação em CSV (bytes UTF-8, bloco a bloco)
+def iter_csv(data, linhas, tamanho_bloco=CHUNK_SIZE):
+    cabecalho = True
+    for bloco in _chunks(data, linhas, tamanho_bloco):
+        yield bloco.to_csv(index=False, header=cabecalho, date_format='%Y-%m-%d').encode('utf-8')
+        cabecalho = False
+
+
+# Destino de escrita que só acumula os bytes até o gerador entregá-los
+class _Buffer:
+    def __init__(self):
+        self.partes = []
+        self.closed = False
+
+    def write(self, dados):
+        self.partes.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        conteudo = b''.join(self.partes)
+        self.partes = []
+        return conteudo
+
+
+# Função geradora da exportação em Parquet (um row group por bloco)
+def iter_parquet(data, linhas, tamanho_bloco=CHUNK_SIZE):
+    if pq is None:
+        raise RuntimeError("pyarrow não está instalado; não é possível exportar em Parquet")
+
+    buffer = _Buffer()
+    escritor = None
+    try:
+        for bloco in _chunks(data, linhas, tamanho_bloco):
+            # Categorias viram texto: cada row group levaria o dicionário inteiro da coluna
+            for coluna in bloco.select_dtypes('category').columns:
+                bloco[coluna] = np.asarray(bloco[coluna], dtype=object)
+            if escritor is None:
+                # Esquema fixado no primeiro bloco (colunas só com vazios são gravadas como texto)
+                schema = pa.schema([
+                    pa.field(campo.name, pa.string()) if pa.types.is_null(campo.type) else campo
+                    for campo in pa.Schema.from_pandas(bloco, preserve_index=False)
+                ])
+                escritor = pq.ParquetWriter(pa.PythonFile(buffer, mode='w'), schema)
+            escritor.write_table(pa.Table.from_pandas(bloco, schema=escritor.schema, preserve_index=False))
+            yield buffer.drain()
+    finally:
+        if escritor is not None:
+            escritor.close()
+    yield buffer.drain()
+
+
+# Função para escolher o gerador da exportação pelo formato
+def iter_export(data, linhas, formato='csv', tamanho_bloco=CHUNK_SIZE):
+    if formato == 'csv':
+        return iter_csv(data, linhas, tamanho_bloco)
+    if formato == 'parquet':
+        return iter_parquet(data, linhas, tamanho_bloco)
+    raise ValueError(f"Formato desconhecido: {formato}")
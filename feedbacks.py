@@ -0,0 +1,103 @@
+import argparse
+import csv
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+DB_PATH = 'feedbacks.db'
+LEGACY_CSV_PATH = 'feedbacks.csv'
+
+
+# Armazenamento dos relatórios de erro em SQLite (modo WAL), seguro para várias sessões e processos
+class FeedbackStore:
+    def __init__(self, path=DB_PATH, legacy_csv=LEGACY_CSV_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        # Uma conexão por processo, protegida por lock; entre processos quem coordena é o SQLite
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            with self._conn:
+                self._conn.execute("""
+                    CREATE TABLE IF NOT EXISTS feedbacks (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        data TEXT NOT NULL,
+                        produto TEXT,
+                        empresa TEXT,
+                        erro TEXT NOT NULL
+                    )
+                """)
+                self._conn.execute("CREATE INDEX IF NOT EXISTS idx_feedbacks_produto ON feedbacks (produto)")
+                self._conn.execute("CREATE INDEX IF NOT EXISTS idx_feedbacks_empresa ON feedbacks (empresa)")
+
+        if legacy_csv and os.path.exists(legacy_csv):
+            self._import_legacy_csv(legacy_csv)
+
+    # Importa (uma única vez) os relatórios gravados no antigo feedbacks.csv
+    # A verificação da tabela vazia e a importação ficam na mesma transação de escrita (BEGIN IMMEDIATE): com vários
+    # processos iniciando juntos, só o primeiro importa; os demais esperam o bloqueio e encontram a tabela preenchida
+    def _import_legacy_csv(self, legacy_csv):
+        with open(legacy_csv, newline='', encoding='utf-8') as f:
+            linhas = [
+                (linha.get('data', ''), linha.get('produto'), linha.get('empresa'), linha.get('erro', ''))
+                for linha in csv.DictReader(f)
+            ]
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            if self._conn.execute("SELECT 1 FROM feedbacks LIMIT 1").fetchone():
+                return
+            self._conn.executemany(
+                "INSERT INTO feedbacks (data, produto, empresa, erro) VALUES (?, ?, ?, ?)",
+                linhas
+            )
+
+    # Grava um relatório de erro
+    def add(self, produto, empresa, erro, data=None):
+        if data is None:
+            data = datetime.now().strftime("%Y-%m-%d %H:%M")
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO feedbacks (data, produto, empresa, erro) VALUES (?, ?, ?, ?)",
+                (data, produto, empresa, erro)
+            )
+        return cursor.lastrowid
+
+    # Lista relatórios (mais recentes primeiro), filtrando por produto e/ou empresa via índice
+    def list(self, produto=None, empresa=None, limit=100):
+        filtros, parametros = [], []
+        if produto is not None:
+            filtros.append("produto = ?")
+            parametros.append(produto)
+        if empresa is not None:
+            filtros.append("empresa = ?")
+            parametros.append(empresa)
+
+        consulta = "SELECT id, data, produto, empresa, erro FROM feedbacks"
+        if filtros:
+            consulta += " WHERE " + " AND ".join(filtros)
+        consulta += " ORDER BY id DESC LIMIT ?"
+        parametros.append(limit)
+
+        with self._lock:
+            return [dict(linha) for linha in self._conn.execute(consulta, parametros)]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lista os relatórios de erro enviados pelos fiscais")
+    parser.add_argument('--produto')
+    parser.add_argument('--empresa')
+    parser.add_argument('--limite', type=int, default=100)
+    parser.add_argument('--banco', default=DB_PATH)
+    args = parser.parse_args()
+
+    store = FeedbackStore(args.banco)
+    for relatorio in store.list(args.produto, args.empresa, args.limite):
+        print(f"[{relatorio['data']}] {relatorio['produto']} | {relatorio['empresa']}: {relatorio['erro']}")
@@ -0,0 +1,197 @@
+import json
+import os
+import time
+
+import numpy as np
+
+# Random Forest compilado em arrays: as árvores do scikit-learn achatadas em arrays contíguos (atributo,
+# limiar e filhos de cada nó, probabilidades das folhas), gravados em .npy sem pickle e mapeados em memória,
+# de modo que os processos de uma máquina compartilham as mesmas páginas
+# A avaliação desce todas as linhas de um bloco de árvores ao mesmo tempo, um nível por passo, e reproduz o
+# predict do scikit-learn: entradas em float32, desvio à esquerda quando X <= limiar, probabilidades
+# normalizadas das folhas somadas na ordem das árvores, média e argmax
+# As folhas apontam para si mesmas com limiar infinito: um passo a mais numa folha não sai dela, então os
+# passos rodam sem máscara e as linhas que já chegaram às folhas só são retiradas a cada PASSOS_POR_VERIFICACAO
+
+FOREST_DIR = 'data/floresta'
+METADATA_FILE = 'floresta.json'
+ARRAYS = ['atributos', 'limiares', 'filhos', 'folhas', 'valores', 'raizes']
+
+# Pares (linha, árvore) avaliados por vez: blocos menores mantêm os nós das árvores do bloco no cache
+PARES_POR_BLOCO = 1 << 15
+PASSOS_POR_VERIFICACAO = 4
+
+# Linhas sorteadas para conferir a floresta compilada contra o modelo original na exportação
+LINHAS_VERIFICACAO = 20000
+
+
+# Função para montar o caminho do arquivo de metadados (gravado por último: é ele que publica uma versão)
+def metadata_path(pasta=FOREST_DIR):
+    return os.path.join(pasta, METADATA_FILE)
+
+
+# Floresta de classificação avaliada só com numpy
+class CompiledForest:
+    def __init__(self, atributos, limiares, filhos, folhas, valores, raizes, classes, n_atributos):
+        self._atributos = atributos
+        self._limiares = limiares
+        self._filhos = filhos
+        self._folhas = folhas
+        self._valores = valores
+        self._raizes = raizes
+        self.classes_ = np.asarray(classes)
+        self.n_features_in_ = n_atributos
+
+    # Converte um RandomForestClassifier (ou ExtraTreesClassifier) já treinado
+    @classmethod
+    def from_sklearn(cls, modelo):
+        arvores = getattr(modelo, 'estimators_', None)
+        if arvores is None or getattr(modelo, 'n_outputs_', 1) != 1:
+            raise ValueError("Só florestas de classificação com uma única saída podem ser compiladas")
+
+        atributos, limiares, filhos, folhas, valores, raizes = [], [], [], [], [], []
+        inicio = 0
+        for arvore in arvores:
+            tree = arvore.tree_
+            folha = tree.children_left < 0
+            proprios = np.arange(inicio, inicio + tree.node_count)
+
+            # Nós numerados em sequência para a floresta inteira
+            atributos.append(np.where(folha, 0, tree.feature))
+            limiares.append(np.where(folha, np.inf, tree.threshold))
+            filhos.append(np.column_stack([
+                np.where(folha, proprios, tree.children_left + inicio),
+                np.where(folha, proprios, tree.children_right + inicio)
+            ]).ravel())
+            folhas.append(folha)
+
+            # Mesma normalização do DecisionTreeClassifier.predict_proba
+            proba = np.array(tree.value[:, 0, :arvore.n_classes_], dtype=np.float64)
+            normalizador = proba.sum(axis=1)[:, np.newaxis]
+            normalizador[normalizador == 0.0] = 1.0
+            proba /= normalizador
+            valores.append(proba)
+
+            raizes.append(inicio)
+            inicio += tree.node_count
+
+        # Índices já em int64 (intp): a indexação do numpy não precisa convertê-los a cada passo
+        return cls(
+            np.concatenate(atributos).astype(np.int64),
+            np.concatenate(limiares).astype(np.float64),
+            np.concatenate(filhos).astype(np.int64),
+            np.concatenate(folhas),
+            np.concatenate(valores),
+            np.array(raizes, dtype=np.int64),
+            modelo.classes_,
+            int(modelo.n_features_in_)
+        )
+
+    # Abre uma floresta gravada (arrays mapeados em memória, sem pickle)
+    @classmethod
+    def load(cls, pasta=FOREST_DIR):
+        with open(metadata_path(pasta), encoding='utf-8') as f:
+            metadados = json.load(f)
+        arrays = {
+            nome: np.load(os.path.join(pasta, arquivo), mmap_mode='r', allow_pickle=False)
+            for nome, arquivo in metadados['arquivos'].items()
+        }
+        if len(arrays['atributos']) != metadados['nos'] or len(arrays['raizes']) != metadados['arvores']:
+            raise ValueError(f"Arquivos da floresta em {pasta} incompletos ou de versões diferentes")
+        return cls(classes=metadados['classes'], n_atributos=metadados['n_atributos'], **arrays)
+
+    # Grava os arrays com nomes da nova versão e publica trocando o arquivo de metadados;
+    # quem já abriu a versão anterior continua com ela
+    def save(self, pasta=FOREST_DIR):
+        os.makedirs(pasta, exist_ok=True)
+        versao = str(time.time_ns())
+        arquivos = {}
+        for nome in ARRAYS:
+            arquivos[nome] = f"{nome}.{versao}.npy"
+            with open(os.path.join(pasta, arquivos[nome]), 'wb') as f:
+                np.save(f, np.asarray(getattr(self, '_' + nome)), allow_pickle=False)
+
+        metadados = {
+            'arquivos': arquivos,
+            'classes': [c.item() if hasattr(c, 'item') else c for c in self.classes_],
+            'n_atributos': self.n_features_in_,
+            'nos': len(self._atributos),
+            'arvores': len(self._raizes)
+        }
+        with open(metadata_path(pasta) + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(metadados, f, ensure_ascii=False)
+        os.replace(metadata_path(pasta) + '.tmp', metadata_path(pasta))
+
+        # Arrays de versões anteriores não serão mais abertos
+        for nome in os.listdir(pasta):
+            if nome.endswith('.npy') and nome not in arquivos.values():
+                os.remove(os.path.join(pasta, nome))
+        return metadata_path(pasta)
+
+    def __len__(self):
+        return len(self._raizes)
+
+    # Gera, bloco a bloco de árvores, a folha alcançada por cada linha: arrays (árvores do bloco, linhas)
+    def _leaves(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Esperada uma matriz com {self.n_features_in_} colunas, recebido formato {X.shape}")
+        n = len(X)
+
+        # float32 promovido a float64 na comparação com o limiar, como no scikit-learn
+        valores_x = X.astype(np.float64).ravel()
+        inicio_linha = np.arange(n, dtype=np.int64) * self.n_features_in_
+        arvores_por_bloco = max(1, PARES_POR_BLOCO // max(n, 1))
+
+        for inicio in range(0, len(self._raizes), arvores_por_bloco):
+            raizes = self._raizes[inicio:inicio + arvores_por_bloco]
+            nos = np.repeat(raizes, n)
+            ativos = np.arange(len(nos))
+            atuais, deslocamentos = nos.copy(), np.tile(inicio_linha, len(raizes))
+            while len(ativos):
+                for _ in range(PASSOS_POR_VERIFICACAO):
+                    direita = ~(valores_x[deslocamentos + self._atributos[atuais]] <= self._limiares[atuais])
+                    atuais = self._filhos[2 * atuais + direita]
+                nos[ativos] = atuais
+                pendentes = ~self._folhas[atuais]
+                ativos, atuais, deslocamentos = ativos[pendentes], atuais[pendentes], deslocamentos[pendentes]
+            yield nos.reshape(len(raizes), n)
+
+    # Retorna a folha alcançada em cada árvore por cada linha: array (árvores, linhas)
+    def apply(self, X):
+        return np.concatenate(list(self._leaves(X)))
+
+    # Probabilidade média de cada classe (somadas árvore a árvore, na mesma ordem do scikit-learn)
+    def predict_proba(self, X):
+        proba = np.zeros((len(X), self._valores.shape[1]), dtype=np.float64)
+        for folhas in self._leaves(X):
+            for folhas_arvore in folhas:
+                proba += self._valores[folhas_arvore]
+        proba /= len(self._raizes)
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+
+# Função para conferir a floresta compilada contra o modelo original em linhas sorteadas
+# Os valores sorteados cobrem a faixa dos limiares de cada atributo, incluindo os próprios limiares
+def verify(modelo, compilado, linhas=LINHAS_VERIFICACAO, semente=0):
+    rng = np.random.default_rng(semente)
+    colunas = []
+    for atributo in range(compilado.n_features_in_):
+        internos = ~np.asarray(compilado._folhas)
+        limiares = np.asarray(compilado._limiares)[internos & (np.asarray(compilado._atributos) == atributo)]
+        maximo = int(np.ceil(limiares.max())) + 2 if len(limiares) else 2
+        coluna = rng.integers(-1, maximo, linhas).astype(np.float64)
+        if len(limiares):
+            sorteados = rng.random(linhas) < 0.25
+            coluna[sorteados] = rng.choice(limiares, int(sorteados.sum()))
+        colunas.append(coluna)
+    X = np.column_stack(colunas).astype(np.float32)
+
+    esperado, obtido = modelo.predict_proba(X), compilado.predict_proba(X)
+    divergentes = int((esperado != obtido).any(axis=1).sum())
+    if divergentes or not np.array_equal(modelo.predict(X), compilado.predict(X)):
+        raise ValueError(f"A floresta compilada diverge do modelo original em {divergentes} de {linhas} linhas")
+    return linhas
@@ -0,0 +1,195 @@
+import json
+import os
+import threading
+import time
+import traceback
+
+# Métricas de tempo por etapa (contagem, soma e histograma de latência)
+# Ativadas com ANVISA_METRICAS=1; desativadas, timer() devolve um objeto nulo compartilhado
+# ANVISA_METRICAS_ARQUIVO=/caminho/anvisa.prom grava periodicamente o formato texto do Prometheus
+
+ENV_ATIVO = 'ANVISA_METRICAS'
+ENV_ARQUIVO = 'ANVISA_METRICAS_ARQUIVO'
+EXPORT_INTERVAL = 15
+
+# Limites superiores (segundos) dos intervalos do histograma
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, float('inf'))
+
+_ativo = os.environ.get(ENV_ATIVO, '').strip().lower() not in ('', '0', 'false', 'nao', 'não')
+
+
+# Função para verificar se a coleta de métricas está ativa
+def enabled():
+    return _ativo
+
+
+# Função para ativar ou desativar a coleta em tempo de execução
+def enable(ativo=True):
+    global _ativo
+    _ativo = ativo
+
+
+# Estatísticas acumuladas de uma etapa
+class _Stage:
+    def __init__(self):
+        self.contagem = 0
+        self.soma = 0.0
+        self.maximo = 0.0
+        self.buckets = [0] * len(BUCKETS)
+
+    def observe(self, duracao):
+        self.contagem += 1
+        self.soma += duracao
+        self.maximo = max(self.maximo, duracao)
+        for i, limite in enumerate(BUCKETS):
+            if duracao <= limite:
+                self.buckets[i] += 1
+                break
+
+
+# Registro de métricas do processo
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._etapas = {}
+        self._contadores = {}
+
+    def observe(self, etapa, duracao):
+        with self._lock:
+            estatisticas = self._etapas.get(etapa)
+            if estatisticas is None:
+                estatisticas = self._etapas[etapa] = _Stage()
+            estatisticas.observe(duracao)
+
+    def reset(self):
+        with self._lock:
+            self._etapas.clear()
+
+    # Contadores mantidos por outros módulos (ex.: acertos do cache), lidos a cada exportação
+    # leitor: função sem argumentos que retorna {nome do contador: valor}
+    def add_counters(self, nome, leitor):
+        with self._lock:
+            self._contadores[nome] = leitor
+
+    def counters(self):
+        with self._lock:
+            leitores = sorted(self._contadores.items())
+        return {nome: leitor() for nome, leitor in leitores}
+
+    # Cópia das métricas atuais, por etapa
+    def snapshot(self):
+        with self._lock:
+            return {
+                etapa: {
+                    'contagem': e.contagem,
+                    'soma_s': e.soma,
+                    'media_s': e.soma / e.contagem if e.contagem else 0.0,
+                    'maximo_s': e.maximo,
+                    'buckets': list(e.buckets)
+                }
+                for etapa, e in sorted(self._etapas.items())
+            }
+
+    def to_json(self):
+        return json.dumps({
+            'ativo': enabled(),
+            'buckets_s': [str(b) for b in BUCKETS],
+            'etapas': self.snapshot(),
+            'contadores': self.counters()
+        })
+
+    # Formato texto de exposição do Prometheus (histograma cumulativo por etapa)
+    def to_prometheus(self):
+        linhas = [
+            '# HELP anvisa_etapa_segundos Duracao das etapas da aplicacao em segundos',
+            '# TYPE anvisa_etapa_segundos histogram'
+        ]
+        for etapa, e in self.snapshot().items():
+            acumulado = 0
+            for limite, quantidade in zip(BUCKETS, e['buckets']):
+                acumulado += quantidade
+                le = '+Inf' if limite == float('inf') else repr(limite)
+                linhas.append(f'anvisa_etapa_segundos_bucket{{etapa="{etapa}",le="{le}"}} {acumulado}')
+            linhas.append(f'anvisa_etapa_segundos_sum{{etapa="{etapa}"}} {e["soma_s"]}')
+            linhas.append(f'anvisa_etapa_segundos_count{{etapa="{etapa}"}} {e["contagem"]}')
+        for nome, valores in self.counters().items():
+            linhas.append(f'# TYPE anvisa_{nome} gauge')
+            for contador, valor in valores.items():
+                linhas.append(f'anvisa_{nome}{{contador="{contador}"}} {valor}')
+        return '\n'.join(linhas) + '\n'
+
+
+registro = Registry()
+
+
+# Cronômetro usado quando a coleta está ativa
+class _Timer:
+    __slots__ = ('etapa', 'inicio')
+
+    def __init__(self, etapa):
+        self.etapa = etapa
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        registro.observe(self.etapa, time.perf_counter() - self.inicio)
+        return False
+
+
+# Objeto nulo usado quando a coleta está desativada
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULO = _NullTimer()
+
+
+# Função para medir uma etapa: with metricas.timer('consulta'): ...
+def timer(etapa):
+    if not _ativo:
+        return _NULO
+    return _Timer(etapa)
+
+
+# Função para gravar as métricas em arquivo (troca atômica, para o coletor nunca ler pela metade)
+def write_prometheus(caminho):
+    tmp_path = caminho + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(registro.to_prometheus())
+    os.replace(tmp_path, caminho)
+
+
+_exportador = None
+_exportador_lock = threading.Lock()
+
+
+# Função para iniciar a gravação periódica do arquivo de métricas (se configurado e ainda não iniciado)
+def start_file_export(caminho=None, intervalo=EXPORT_INTERVAL):
+    global _exportador
+    caminho = caminho or os.environ.get(ENV_ARQUIVO)
+    if not _ativo or not caminho:
+        return False
+
+    with _exportador_lock:
+        if _exportador is not None:
+            return True
+
+        def exportar():
+            while True:
+                try:
+                    write_prometheus(caminho)
+                except Exception:
+                    traceback.print_exc()
+                time.sleep(intervalo)
+
+        _exportador = threading.Thread(target=exportar, name='metricas-arquivo', daemon=True)
+        _exportador.start()
+        return True
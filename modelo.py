@@ -0,0 +1,164 @@
+import argparse
+import lzma
+import os
+import pickle
+import threading
+import traceback
+
+import joblib
+
+import floresta
+import metricas
+
+# zstandard é opcional: só é usado se o arquivo .zst existir e o pacote estiver instalado
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+XZ_PATH = 'data/modelo_final.pkl.xz'
+JOBLIB_PATH = 'data/modelo_final.joblib'
+ZST_PATH = 'data/modelo_final.pkl.zst'
+
+
+# Função para listar os formatos disponíveis, do mais rápido para o mais lento
+def model_candidates():
+    candidatos = [(JOBLIB_PATH, 'joblib')]
+    if zstandard is not None:
+        candidatos.append((ZST_PATH, 'zst'))
+    candidatos.append((XZ_PATH, 'xz'))
+    return candidatos
+
+
+# Função para escolher o arquivo do modelo; formatos derivados só valem se não forem mais antigos que o .xz
+def find_model_file():
+    origem_mtime = os.path.getmtime(XZ_PATH) if os.path.exists(XZ_PATH) else None
+    for caminho, formato in model_candidates():
+        if not os.path.exists(caminho):
+            continue
+        if formato != 'xz' and origem_mtime is not None and os.path.getmtime(caminho) < origem_mtime:
+            continue
+        return caminho, formato
+    return None, None
+
+
+# Função para verificar se a floresta compilada existe e não é mais antiga que o modelo de origem
+def compiled_model_fresh(pasta=floresta.FOREST_DIR):
+    caminho = floresta.metadata_path(pasta)
+    if not os.path.exists(caminho):
+        return False
+    origem = XZ_PATH if os.path.exists(XZ_PATH) else find_model_file()[0]
+    return origem is None or os.path.getmtime(caminho) >= os.path.getmtime(origem)
+
+
+# Função para verificar se existe algum arquivo de modelo disponível
+def model_file_exists():
+    return find_model_file()[0] is not None or compiled_model_fresh()
+
+
+# Função para carregar o modelo a partir do melhor formato disponível
+# A floresta compilada (python modelo.py --formato floresta) tem preferência: mesmas previsões, sem scikit-learn
+def load_model(compilado=True):
+    if compilado and compiled_model_fresh():
+        try:
+            with metricas.timer('modelo_floresta'):
+                return floresta.CompiledForest.load()
+        except (OSError, ValueError, KeyError):
+            # Arquivos incompletos ou corrompidos: usa o modelo do scikit-learn
+            traceback.print_exc()
+
+    caminho, formato = find_model_file()
+    if caminho is None:
+        raise FileNotFoundError(f"Nenhum arquivo de modelo encontrado (esperado {XZ_PATH})")
+
+    with metricas.timer(f'modelo_{formato}'):
+        if formato == 'joblib':
+            # Arquivo sem compressão: os arrays numpy são mapeados em memória
+            return joblib.load(caminho, mmap_mode='r')
+        if formato == 'zst':
+            with open(caminho, 'rb') as f:
+                with zstandard.ZstdDecompressor().stream_reader(f) as leitor:
+                    return pickle.load(leitor)
+        with lzma.open(caminho, 'rb') as f:
+            return pickle.load(f)
+
+
+# Carregamento preguiçoso do modelo, compartilhado entre as sessões
+class LazyModel:
+    def __init__(self, loader=load_model):
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._modelo = None
+        self._thread = None
+
+    @property
+    def loaded(self):
+        return self._modelo is not None
+
+    # Retorna o modelo, carregando-o no primeiro uso
+    def get(self):
+        if self._modelo is None:
+            with self._lock:
+                if self._modelo is None:
+                    self._modelo = self._loader()
+        return self._modelo
+
+    # Inicia o carregamento em segundo plano (uma única vez)
+    def preload(self):
+        with self._lock:
+            if self._modelo is not None or self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._preload, name='modelo-preload', daemon=True)
+            self._thread.start()
+
+    def _preload(self):
+        try:
+            self.get()
+        except Exception:
+            # O erro será lançado novamente no primeiro uso real via get()
+            with self._lock:
+                self._thread = None
+
+
+# Função para exportar as árvores do modelo para arrays (floresta compilada), conferindo as previsões
+def export_forest(pasta=floresta.FOREST_DIR):
+    modelo = load_model(compilado=False)
+    compilado = floresta.CompiledForest.from_sklearn(modelo)
+    floresta.verify(modelo, compilado)
+    return compilado.save(pasta)
+
+
+# Função para converter o modelo .xz para um formato mais rápido de carregar
+def convert_model(formato='joblib'):
+    if formato == 'floresta':
+        return export_forest()
+
+    with lzma.open(XZ_PATH, 'rb') as f:
+        modelo = pickle.load(f)
+
+    if formato == 'joblib':
+        destino = JOBLIB_PATH
+        joblib.dump(modelo, destino + '.tmp', compress=0)
+    elif formato == 'zst':
+        if zstandard is None:
+            raise RuntimeError("zstandard não está instalado; não é possível gerar o arquivo .zst")
+        destino = ZST_PATH
+        with open(destino + '.tmp', 'wb') as f:
+            with zstandard.ZstdCompressor(level=10).stream_writer(f) as escritor:
+                pickle.dump(modelo, escritor, protocol=pickle.HIGHEST_PROTOCOL)
+    else:
+        raise ValueError(f"Formato desconhecido: {formato}")
+
+    os.replace(destino + '.tmp', destino)
+    return destino
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Converte modelo_final.pkl.xz para um formato de carregamento mais rápido"
+    )
+    parser.add_argument('--formato', choices=['joblib', 'zst', 'floresta'], default='joblib',
+                        help="floresta: árvores exportadas para arrays, avaliadas sem scikit-learn")
+    args = parser.parse_args()
+
+    print(f"Modelo gravado em {convert_model(args.formato)}")
@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import metricas
+
+# Cache de previsões compartilhado por todas as sessões (e threads do servidor HTTP) do processo
+# Chave: geração do snapshot de dados (nova a cada carga ou atualização, inclusive quando só os encoders
+# mudam) + (categoria, produto, empresa) como texto
+# Os itens mais antigos saem quando a capacidade é atingida (LRU) e todos valem só até a meia-noite,
+# quando a classificação do dia muda; um novo snapshot gera chaves novas
+# ANVISA_CACHE_PREVISOES define a capacidade (0 desativa o cache)
+
+ENV_CAPACIDADE = 'ANVISA_CACHE_PREVISOES'
+CAPACIDADE = 10000
+
+
+# Função para calcular o instante (time.time) da próxima meia-noite local
+def next_midnight(agora):
+    amanha = datetime.fromtimestamp(agora).date() + timedelta(days=1)
+    return datetime.combine(amanha, datetime.min.time()).timestamp()
+
+
+# Função para montar a chave de uma consulta
+def cache_key(data, categoria, produto, empresa):
+    return (data['geracao'], categoria, produto, empresa)
+
+
+# Cache LRU com validade até a meia-noite e contadores de acertos e falhas
+# Os valores guardados são compartilhados entre as sessões: quem os recebe não deve alterá-los
+class PredictionCache:
+    def __init__(self, capacidade=CAPACIDADE, relogio=time.time):
+        self.capacidade = capacidade
+        self._relogio = relogio
+        self._lock = threading.Lock()
+        self._itens = OrderedDict()
+        self.acertos = 0
+        self.falhas = 0
+        self.expirados = 0
+        self.descartados = 0
+
+    def __len__(self):
+        return len(self._itens)
+
+    # Retorna o valor guardado para a chave ou o calcula (fora do bloqueio) e guarda
+    def get_or_compute(self, chave, calcular):
+        if self.capacidade <= 0:
+            return calcular()
+
+        agora = self._relogio()
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is not None:
+                if item[0] > agora:
+                    self._itens.move_to_end(chave)
+                    self.acertos += 1
+                    return item[1]
+                del self._itens[chave]
+                self.expirados += 1
+            self.falhas += 1
+
+        valor = calcular()
+        with self._lock:
+            self._itens[chave] = (next_midnight(agora), valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.capacidade:
+                self._itens.popitem(last=False)
+                self.descartados += 1
+        return valor
+
+    def clear(self):
+        with self._lock:
+            self._itens.clear()
+
+    # Contadores atuais (também exportados junto com as métricas de tempo)
+    def stats(self):
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'expirados': self.expirados,
+                'descartados': self.descartados,
+                'itens': len(self._itens),
+                'capacidade': self.capacidade,
+                'taxa_acerto': self.acertos / consultas if consultas else 0.0
+            }
+
+
+# Função para ler a capacidade configurada (valor inválido usa o padrão)
+def configured_capacity():
+    try:
+        return int(os.environ.get(ENV_CAPACIDADE, CAPACIDADE))
+    except ValueError:
+        return CAPACIDADE
+
+
+cache = PredictionCache(configured_capacity())
+metricas.registro.add_counters('cache_previsoes', cache.stats)
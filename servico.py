@@ -0,0 +1,255 @@
+import argparse
+import json
+import sys
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+import classificacao
+import dados
+import exportacao
+import metricas
+import vencimentos
+
+# Serviço sem interface: mesma carga de dados e mesmos índices da aplicação Streamlit
+#   python servico.py cli < consulta.csv > resultado.csv
+#   python servico.py http --porta 8502 --threads 8
+#   python servico.py exportar --categoria "Outros" --formato parquet > outros.parquet
+
+
+# Função para classificar um CSV vindo da entrada padrão, em blocos, escrevendo na saída padrão
+def run_cli(data, entrada, saida, sep=',', tamanho_bloco=10000):
+    cabecalho = True
+    for bloco in pd.read_csv(entrada, sep=sep, dtype=str, chunksize=tamanho_bloco):
+        resultado = classificacao.classify_batch(data, bloco)
+        resultado.to_csv(saida, index=False, header=cabecalho, date_format='%Y-%m-%d')
+        saida.flush()
+        cabecalho = False
+
+
+# Servidor HTTP que atende as requisições em um pool fixo de threads
+class PooledHTTPServer(HTTPServer):
+    def __init__(self, endereco, handler, threads):
+        super().__init__(endereco, handler)
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='servico')
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._process_request_thread, request, client_address)
+
+    def _process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=True)
+
+
+# Endpoints JSON:
+#   GET  /saude
+#   GET  /produto?categoria=...&produto=...&empresa=...
+#   GET  /registro?numero=...  (um número; vários números via POST /classificar)
+#   GET  /vencimentos?dias=90[&categoria=...][&empresa=...][&pagina=1]
+#   GET  /empresas[?ordenar=VENCIDO][&limite=50]
+#   GET  /exportar?formato=csv|parquet[&categoria=...][&empresa=...]  (resposta enviada em blocos)
+#   GET  /metricas[?formato=prometheus]
+#   POST /classificar  {"itens": [{"NU_REGISTRO_PRODUTO": "..."}, ...]}
+class ConsultaHandler(BaseHTTPRequestHandler):
+    repositorio = None
+
+    # Cada requisição usa um único snapshot do início ao fim, mesmo que haja recarga no meio
+    def setup(self):
+        super().setup()
+        self.data = self.repositorio.current()
+
+    def _send_json(self, status, corpo):
+        conteudo = corpo if isinstance(corpo, bytes) else json.dumps(corpo, default=str, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(conteudo)))
+        self.end_headers()
+        self.wfile.write(conteudo)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parametros = {chave: valores[0] for chave, valores in parse_qs(url.query).items()}
+
+        if url.path == '/saude':
+            self._send_json(200, {'status': 'ok', 'versao': self.data['versao']})
+        elif url.path == '/metricas':
+            if parametros.get('formato') == 'prometheus':
+                conteudo = metricas.registro.to_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(conteudo)))
+                self.end_headers()
+                self.wfile.write(conteudo)
+            else:
+                self._send_json(200, metricas.registro.to_json().encode('utf-8'))
+        elif url.path == '/produto':
+            faltando = [p for p in ('categoria', 'produto', 'empresa') if p not in parametros]
+            if faltando:
+                self._send_json(400, {'erro': f"Parâmetros obrigatórios: {', '.join(faltando)}"})
+                return
+            resultado = classificacao.lookup_product(
+                self.data, parametros['categoria'], parametros['produto'], parametros['empresa']
+            )
+            if resultado is None:
+                self._send_json(404, {'erro': 'Produto não encontrado'})
+            else:
+                self._send_json(200, resultado)
+        elif url.path == '/registro':
+            if 'numero' not in parametros:
+                self._send_json(400, {'erro': "Parâmetro obrigatório: numero"})
+                return
+            resultado = classificacao.lookup_registration(self.data, parametros['numero'])
+            if resultado is None:
+                self._send_json(404, {'erro': 'Registro não encontrado'})
+            else:
+                self._send_json(200, resultado)
+        elif url.path == '/vencimentos':
+            try:
+                dias = int(parametros.get('dias', vencimentos.PRAZOS[-1]))
+                pagina = int(parametros.get('pagina', 1))
+            except ValueError:
+                self._send_json(400, {'erro': "Parâmetros dias e pagina devem ser números inteiros"})
+                return
+            total, linhas = self.data['vencimentos'].expiring(
+                dias, parametros.get('categoria'), parametros.get('empresa'), pagina=max(pagina, 1) - 1
+            )
+            registros = classificacao.classified_rows(self.data, linhas)
+            self._send_json(200, {
+                'total': total,
+                'pagina': max(pagina, 1),
+                'tamanho_pagina': vencimentos.TAMANHO_PAGINA,
+                'registros': json.loads(registros.to_json(orient='records', date_format='iso', force_ascii=False))
+            })
+        elif url.path == '/empresas':
+            carteira = self.data['carteiras'].get()
+            ordenar = parametros.get('ordenar', 'VENCIDO')
+            if ordenar not in carteira.columns:
+                self._send_json(400, {'erro': f"Coluna de ordenação inválida: {ordenar}"})
+                return
+            try:
+                limite = int(parametros.get('limite', 50))
+            except ValueError:
+                self._send_json(400, {'erro': "Parâmetro limite deve ser um número inteiro"})
+                return
+            crescente = ordenar in ('DIAS_PARA_VENCER', 'PROXIMO_VENCIMENTO')
+            selecao = carteira.sort_values(ordenar, ascending=crescente, na_position='last').head(limite)
+            self._send_json(200, selecao.reset_index().to_json(orient='records', date_format='iso', force_ascii=False).encode('utf-8'))
+        elif url.path == '/exportar':
+            self._send_export(parametros)
+        else:
+            self._send_json(404, {'erro': 'Endpoint não encontrado'})
+
+    # Envia a exportação à medida que os blocos são gerados (sem Content-Length; o fim é o fechamento da conexão)
+    def _send_export(self, parametros):
+        formato = parametros.get('formato', 'csv')
+        if formato not in exportacao.FORMATOS:
+            self._send_json(400, {'erro': f"Formato desconhecido: {formato}"})
+            return
+        linhas = exportacao.select_rows(self.data['produtos_df'], parametros.get('categoria'), parametros.get('empresa'))
+        blocos = exportacao.iter_export(self.data, linhas, formato)
+        try:
+            primeiro = next(blocos)
+        except RuntimeError as e:
+            self._send_json(400, {'erro': str(e)})
+            return
+
+        tipo, extensao = exportacao.FORMATOS[formato]
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Disposition', f'attachment; filename="produtos.{extensao}"')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        try:
+            self.wfile.write(primeiro)
+            for bloco in blocos:
+                self.wfile.write(bloco)
+        except (BrokenPipeError, ConnectionResetError):
+            # Cliente desistiu do download: interrompe a geração dos blocos restantes
+            blocos.close()
+
+    def do_POST(self):
+        if urlparse(self.path).path != '/classificar':
+            self._send_json(404, {'erro': 'Endpoint não encontrado'})
+            return
+        try:
+            tamanho = int(self.headers.get('Content-Length', 0))
+            corpo = json.loads(self.rfile.read(tamanho) or b'{}')
+            consulta_df = pd.DataFrame(corpo.get('itens', []), dtype=str)
+            resultado = classificacao.classify_batch(self.data, consulta_df)
+        except (ValueError, AttributeError) as e:
+            self._send_json(400, {'erro': str(e)})
+            return
+        except Exception as e:
+            traceback.print_exc()
+            self._send_json(500, {'erro': str(e)})
+            return
+        self._send_json(200, resultado.to_json(orient='records', date_format='iso', force_ascii=False).encode('utf-8'))
+
+    def log_message(self, format, *args):
+        sys.stderr.write("%s - %s\n" % (self.address_string(), format % args))
+
+
+# Função para iniciar o servidor HTTP local (recarregando os dados quando os arquivos mudam)
+def run_http(repositorio, host='127.0.0.1', porta=8502, threads=8):
+    repositorio.start_watching()
+    metricas.start_file_export()
+    handler = type('Handler', (ConsultaHandler,), {'repositorio': repositorio})
+    servidor = PooledHTTPServer((host, porta), handler, threads)
+    print(f"Servindo em http://{host}:{porta} com {threads} threads", file=sys.stderr)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Consulta e classificação de produtos sem a interface Streamlit")
+    subparsers = parser.add_subparsers(dest='modo', required=True)
+
+    parser_cli = subparsers.add_parser('cli', help="Classifica um CSV da entrada padrão e escreve na saída padrão")
+    parser_cli.add_argument('--sep', default=',')
+    parser_cli.add_argument('--bloco', type=int, default=10000)
+
+    parser_http = subparsers.add_parser('http', help="Inicia o endpoint HTTP JSON local")
+    parser_http.add_argument('--host', default='127.0.0.1')
+    parser_http.add_argument('--porta', type=int, default=8502)
+    parser_http.add_argument('--threads', type=int, default=8)
+    parser_http.add_argument('--recarga', type=int, default=dados.RELOAD_INTERVAL,
+                             help="segundos entre as verificações de arquivos alterados")
+
+    parser_exportar = subparsers.add_parser('exportar', help="Exporta os registros filtrados para a saída padrão")
+    parser_exportar.add_argument('--categoria')
+    parser_exportar.add_argument('--empresa')
+    parser_exportar.add_argument('--formato', choices=list(exportacao.FORMATOS), default='csv')
+
+    args = parser.parse_args()
+
+    missing = dados.missing_files()
+    if missing:
+        sys.exit(f"Arquivos faltando: {', '.join(missing)}")
+
+    if args.modo == 'cli':
+        run_cli(dados.load_bundle(), sys.stdin, sys.stdout, sep=args.sep, tamanho_bloco=args.bloco)
+    elif args.modo == 'exportar':
+        data = dados.load_bundle()
+        linhas = exportacao.select_rows(data['produtos_df'], args.categoria, args.empresa)
+        for bloco in exportacao.iter_export(data, linhas, args.formato):
+            sys.stdout.buffer.write(bloco)
+        sys.stdout.buffer.flush()
+    else:
+        repositorio = dados.BundleRepository(intervalo=args.recarga)
+        run_http(repositorio, host=args.host, porta=args.porta, threads=args.threads)
@@ -0,0 +1,128 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+import metricas
+
+# Prazos (em dias) oferecidos na consulta de vencimentos
+PRAZOS = [30, 90, 180]
+
+# Registros por página na consulta de vencimentos
+TAMANHO_PAGINA = 50
+
+_VAZIO = (np.array([], dtype='datetime64[ns]'), np.array([], dtype=np.int64))
+
+
+# Função para calcular o intervalo [início, fim) de datas que vencem nos próximos N dias (hoje incluído)
+def horizon(dias, hoje=None):
+    hoje = hoje or date.today()
+    return np.datetime64(hoje, 'ns'), np.datetime64(hoje + timedelta(days=dias + 1), 'ns')
+
+
+# Índice das linhas ordenadas por data de vencimento (geral, por categoria e por empresa)
+# Cada consulta é uma busca binária no array de datas: só as linhas da página são lidas
+class ExpiryIndex:
+    def __init__(self, produtos_df):
+        datas = produtos_df['DT_VENCIMENTO_REGISTRO'].to_numpy(dtype='datetime64[ns]')
+
+        # Registros sem data de vencimento nunca vencem e ficam fora do índice
+        com_data = np.flatnonzero(~np.isnat(datas))
+        ordem = com_data[np.argsort(datas[com_data], kind='stable')]
+        self._geral = (datas[ordem], ordem)
+
+        categorias = produtos_df['DS_CATEGORIA_PRODUTO'].array
+        self._codigos_categoria = categorias.codes
+        self._posicoes_categoria = {nome: i for i, nome in enumerate(categorias.categories)}
+        self._por_categoria = self._group(categorias, datas, ordem)
+        self._por_empresa = self._group(produtos_df['NO_RAZAO_SOCIAL_EMPRESA'].array, datas, ordem)
+
+    # Separa a ordem geral por grupo; a ordenação estável mantém as datas em ordem dentro de cada grupo
+    @staticmethod
+    def _group(valores, datas, ordem):
+        codigos = valores.codes[ordem]
+        posicoes = np.argsort(codigos, kind='stable')
+        linhas = ordem[posicoes]
+        limites = np.searchsorted(codigos[posicoes], np.arange(len(valores.categories) + 1))
+
+        grupos = {}
+        for i, nome in enumerate(valores.categories):
+            inicio, fim = limites[i], limites[i + 1]
+            if fim > inicio:
+                grupos[nome] = (datas[linhas[inicio:fim]], linhas[inicio:fim])
+        return grupos
+
+    # Retira as linhas alteradas de um grupo e insere as que pertencem a ele nas posições da ordem por data
+    @staticmethod
+    def _replace(grupo, removidas, inseridas, datas):
+        datas_grupo, linhas_grupo = grupo
+        manter = ~np.isin(linhas_grupo, removidas)
+        datas_grupo, linhas_grupo = datas_grupo[manter], linhas_grupo[manter]
+
+        inseridas = inseridas[~np.isnat(datas[inseridas])]
+        inseridas = inseridas[np.argsort(datas[inseridas], kind='stable')]
+        posicoes = np.searchsorted(datas_grupo, datas[inseridas], side='right')
+        return np.insert(datas_grupo, posicoes, datas[inseridas]), np.insert(linhas_grupo, posicoes, inseridas)
+
+    # Retorna uma cópia para a nova versão da base em que só as linhas informadas mudaram (ou foram acrescentadas)
+    # Apenas a ordem geral e os grupos (categorias e empresas) dessas linhas são refeitos
+    def patched(self, produtos_df, anterior_df, linhas):
+        linhas = np.unique(linhas)
+        antigas = linhas[linhas < len(anterior_df)]
+        datas = produtos_df['DT_VENCIMENTO_REGISTRO'].to_numpy(dtype='datetime64[ns]')
+
+        novo = object.__new__(ExpiryIndex)
+        novo._geral = self._replace(self._geral, linhas, linhas, datas)
+
+        categorias = produtos_df['DS_CATEGORIA_PRODUTO'].array
+        novo._codigos_categoria = categorias.codes
+        novo._posicoes_categoria = {nome: i for i, nome in enumerate(categorias.categories)}
+
+        for atributo, coluna in (('_por_categoria', 'DS_CATEGORIA_PRODUTO'), ('_por_empresa', 'NO_RAZAO_SOCIAL_EMPRESA')):
+            grupos = dict(getattr(self, atributo))
+            valores = np.asarray(produtos_df[coluna].array[linhas], dtype=object)
+            afetados = set(valores) | set(np.asarray(anterior_df[coluna].array[antigas], dtype=object))
+            for nome in afetados:
+                if not isinstance(nome, str):
+                    continue
+                grupo = self._replace(grupos.get(nome, _VAZIO), linhas, linhas[valores == nome], datas)
+                if len(grupo[1]):
+                    grupos[nome] = grupo
+                else:
+                    grupos.pop(nome, None)
+            setattr(novo, atributo, grupos)
+        return novo
+
+    def __len__(self):
+        return len(self._geral[1])
+
+    # Retorna (datas, linhas) dos registros com vencimento de uma empresa, em ordem de data
+    def company_rows(self, empresa):
+        return self._por_empresa.get(empresa, _VAZIO)
+
+    # Retorna (total, linhas da página) dos registros com vencimento em [inicio, fim)
+    def search(self, inicio, fim, categoria=None, empresa=None, pagina=0, tamanho=TAMANHO_PAGINA):
+        with metricas.timer('vencimentos'):
+            return self._search(inicio, fim, categoria, empresa, pagina, tamanho)
+
+    def _search(self, inicio, fim, categoria, empresa, pagina, tamanho):
+        if empresa is not None:
+            datas, linhas = self._por_empresa.get(empresa, _VAZIO)
+        elif categoria is not None:
+            datas, linhas = self._por_categoria.get(categoria, _VAZIO)
+        else:
+            datas, linhas = self._geral
+
+        a, b = np.searchsorted(datas, [inicio, fim])
+        faixa = linhas[a:b]
+
+        # Empresa e categoria juntas: filtra a faixa (já pequena) da empresa pelo código da categoria
+        if empresa is not None and categoria is not None:
+            codigo = self._posicoes_categoria.get(categoria, -2)
+            faixa = faixa[self._codigos_categoria[faixa] == codigo]
+
+        return len(faixa), faixa[pagina * tamanho:(pagina + 1) * tamanho]
+
+    # Atalho para os registros que vencem nos próximos N dias
+    def expiring(self, dias, categoria=None, empresa=None, pagina=0, tamanho=TAMANHO_PAGINA, hoje=None):
+        inicio, fim = horizon(dias, hoje)
+        return self.search(inicio, fim, categoria, empresa, pagina, tamanho)
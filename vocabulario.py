@@ -0,0 +1,133 @@
+import argparse
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Vocabulários (valor ↔ código) guardados como arrays, no lugar dos LabelEncoders em pickle
+# Cada vocabulário são dois arquivos .npy sem pickle: os textos em UTF-8 concatenados e as posições de início
+# de cada texto. Os arquivos são mapeados em memória; os textos e o mapa texto → código só são montados no
+# primeiro uso. O código de um valor é a sua posição na lista ordenada, como no LabelEncoder
+
+VOCABULARY_DIR = 'data/vocabularios'
+
+
+# Função para montar os caminhos dos dois arquivos de um vocabulário
+def vocabulary_paths(nome, pasta=VOCABULARY_DIR):
+    return os.path.join(pasta, f"{nome}.textos.npy"), os.path.join(pasta, f"{nome}.posicoes.npy")
+
+
+# Vocabulário ordenado com codificação e decodificação de colunas inteiras
+class Vocabulary:
+    def __init__(self, textos, posicoes):
+        self._textos = textos
+        self._posicoes = posicoes
+        self._lock = threading.Lock()
+        self._classes = None
+        self._codigos = None
+
+    # Cria um vocabulário a partir de uma lista de valores (ordenados e sem repetição, como no LabelEncoder)
+    @classmethod
+    def from_values(cls, valores):
+        valores = sorted({str(valor) for valor in valores})
+        codificados = [valor.encode('utf-8') for valor in valores]
+        posicoes = np.zeros(len(codificados) + 1, dtype=np.int64)
+        np.cumsum([len(c) for c in codificados], out=posicoes[1:])
+        textos = np.frombuffer(b''.join(codificados), dtype=np.uint8)
+        return cls(textos, posicoes)
+
+    # Abre um vocabulário gravado (arquivos mapeados em memória, sem pickle)
+    @classmethod
+    def load(cls, nome, pasta=VOCABULARY_DIR):
+        caminho_textos, caminho_posicoes = vocabulary_paths(nome, pasta)
+        return cls(
+            np.load(caminho_textos, mmap_mode='r', allow_pickle=False),
+            np.load(caminho_posicoes, mmap_mode='r', allow_pickle=False)
+        )
+
+    # Grava o vocabulário (arquivos temporários trocados no final, para nunca expor um arquivo pela metade)
+    def save(self, nome, pasta=VOCABULARY_DIR):
+        os.makedirs(pasta, exist_ok=True)
+        for caminho, valores in zip(vocabulary_paths(nome, pasta), (self._textos, self._posicoes)):
+            with open(caminho + '.tmp', 'wb') as f:
+                np.save(f, np.asarray(valores), allow_pickle=False)
+            os.replace(caminho + '.tmp', caminho)
+
+    def __len__(self):
+        return len(self._posicoes) - 1
+
+    # Valores em ordem (mesmo papel do classes_ do LabelEncoder)
+    @property
+    def classes_(self):
+        if self._classes is None:
+            with self._lock:
+                if self._classes is None:
+                    dados = bytes(self._textos)
+                    posicoes = self._posicoes.tolist()
+                    self._classes = np.array(
+                        [dados[posicoes[i]:posicoes[i + 1]].decode('utf-8') for i in range(len(self))],
+                        dtype=object
+                    )
+        return self._classes
+
+    # Mapa texto → código, montado uma única vez
+    @property
+    def codigos(self):
+        if self._codigos is None:
+            classes = self.classes_
+            with self._lock:
+                if self._codigos is None:
+                    self._codigos = {valor: i for i, valor in enumerate(classes)}
+        return self._codigos
+
+    # Converte valores em códigos (-1 para valores fora do vocabulário)
+    # Cada valor distinto é procurado uma única vez; o resto é indexação de arrays
+    def encode(self, valores):
+        if isinstance(valores, pd.Categorical):
+            categorias, codigos_valores = valores.categories, valores.codes
+        else:
+            codigos_valores, categorias = pd.factorize(pd.Series(valores, dtype=object), sort=False)
+        codigos = self.codigos
+        mapa = np.array([codigos.get(valor, -1) for valor in categorias], dtype=np.int32)
+        if len(mapa) == 0:
+            return np.full(len(codigos_valores), -1, dtype=np.int32)
+        return np.where(codigos_valores >= 0, mapa[np.maximum(codigos_valores, 0)], -1).astype(np.int32)
+
+    # Mesmo comportamento do LabelEncoder.transform: valores desconhecidos geram erro
+    def transform(self, valores):
+        codigos = self.encode(valores)
+        if (codigos < 0).any():
+            desconhecidos = pd.unique(np.asarray(valores, dtype=object)[codigos < 0])
+            raise ValueError(f"Valores fora do vocabulário: {list(desconhecidos[:5])}")
+        return codigos
+
+    # Converte códigos de volta em valores
+    def inverse_transform(self, codigos):
+        return self.classes_[np.asarray(codigos, dtype=np.int64)]
+
+
+# Função para converter um arquivo de classes em pickle (LabelEncoder ou array) para o formato em arrays
+# É o único ponto que ainda abre o pickle; a aplicação passa a ler só os arrays
+def convert_pickle(caminho_pickle, nome, pasta=VOCABULARY_DIR):
+    import pickle
+
+    with open(caminho_pickle, 'rb') as f:
+        obj = pickle.load(f)
+    vocabulario = Vocabulary.from_values(getattr(obj, 'classes_', obj))
+    vocabulario.save(nome, pasta)
+    return vocabulario
+
+
+if __name__ == "__main__":
+    import dados
+
+    parser = argparse.ArgumentParser(
+        description="Converte os LabelEncoders (le_*.pkl) para vocabulários em arrays, lidos sem pickle"
+    )
+    parser.add_argument('--pasta', default=VOCABULARY_DIR)
+    args = parser.parse_args()
+
+    for nome, caminho in dados.ENCODER_PATHS.items():
+        vocabulario = convert_pickle(caminho, nome, args.pasta)
+        print(f"{nome}: {len(vocabulario)} valores gravados em {vocabulary_paths(nome, args.pasta)[0]}")